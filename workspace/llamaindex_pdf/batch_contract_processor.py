@@ -5,6 +5,8 @@ import argparse
 from datetime import datetime
 import json
 from keyword_only_analyzer import KeywordOnlyAnalyzer
+from pdf_extraction import smart_extract_text
+from sanctions_screening import get_sanctions_index, extract_party_names
 
 class BatchContractProcessor:
     def __init__(self, contracts_folder, cache_folder="./processed_contracts", regulations_folder="./regulations"):
@@ -28,7 +30,7 @@ class BatchContractProcessor:
         
         return pdf_files
     
-    def process_all_contracts(self, force_reprocess=False):
+    def process_all_contracts(self, force_reprocess=False, screen_sanctions=False):
         """Обрабатывает все договоры в папке"""
         contracts = self.find_contract_files()
         
@@ -52,6 +54,7 @@ class BatchContractProcessor:
                 result = self.analyzer.analyze_contract(contract_path)
                 
                 if result:
+                    result['contract_path'] = contract_path
                     self.results.append(result)
                     print(f"✅ Обработан: {result['recommendation']['decision']}")
                 else:
@@ -60,11 +63,56 @@ class BatchContractProcessor:
             except Exception as e:
                 print(f"❌ Ошибка: {e}")
         
+        # Проверяем контрагентов всех договоров по санкционным спискам одним пакетом
+        if screen_sanctions:
+            self.screen_counterparties()
+        
         # Создаем сводный отчет
         self.create_summary_report()
         
         return self.results
     
+    def screen_counterparties(self):
+        """Пакетная проверка контрагентов всех договоров по санкционным спискам"""
+        index = get_sanctions_index()
+        if index is None:
+            print("⚠️ Санкционные списки не загружены, проверка контрагентов пропущена")
+            return
+        
+        # Стороны и банки берем из текста договора: извлечение уже в кэше после анализа
+        texts, parties = {}, {}
+        for result in self.results:
+            text = smart_extract_text(result['contract_path'])
+            if not text:
+                print(f"⚠️ {result['contract_file']}: нет текста для проверки")
+                continue
+            texts[result['contract_path']] = text
+            parties[result['contract_path']] = extract_party_names(text)
+        
+        # Все названия - одним пакетом (нечеткое сравнение, транслитерация); повторы считаются один раз
+        names = sorted({name for names in parties.values() for name in names})
+        print(f"\n🛡️ Проверка {len(names)} контрагентов из {len(texts)} договоров по санкционным спискам...")
+        matches = index.screen_names(names)
+        
+        hits = 0
+        for result in self.results:
+            path = result['contract_path']
+            if path not in texts:
+                continue
+            screening = {
+                'names': {name: matches[name] for name in parties[path] if matches[name]},
+                # Точные вхождения санкционных названий в тексте - дополнительный сигнал
+                'text': index.screen_text(texts[path])
+            }
+            result['counterparties'] = parties[path]
+            result['sanctions_screening'] = screening
+            if screening['names'] or screening['text']:
+                hits += 1
+                found = sorted({hit['name'] for found_hits in screening['names'].values() for hit in found_hits}
+                               | {hit['name'] for hit in screening['text']})
+                print(f"🚨 {result['contract_file']}: совпадения по {', '.join(found)}")
+        print(f"✅ Проверка завершена: договоров с совпадениями - {hits}")
+    
     def has_recent_analysis(self, contract_path):
         """Проверяет есть ли недавний анализ договора"""
         contract_name = os.path.splitext(os.path.basename(contract_path))[0]
@@ -180,6 +228,15 @@ class BatchContractProcessor:
                     for risk in result['recommendation']['critical_risks']:
                         f.write(f"     • {risk}\n")
                 
+                screening = result.get('sanctions_screening')
+                if screening and (screening['names'] or screening['text']):
+                    f.write(f"   Санкционные списки:\n")
+                    for name, hits in screening['names'].items():
+                        best = hits[0]
+                        f.write(f"     • {name} -> {best['name']} ({best['list']}, {best['match']}, {best['score']})\n")
+                    for hit in screening['text']:
+                        f.write(f"     • в тексте: {hit['matched_on']} -> {hit['name']} ({hit['list']})\n")
+                
                 if result['recommendation']['recommendations']:
                     f.write(f"   Рекомендации:\n")
                     for rec in result['recommendation']['recommendations'][:3]:  # Первые 3
@@ -234,6 +291,7 @@ def main():
     parser.add_argument("--regulations", default="./regulations", help="Папка с регламентами")
     parser.add_argument("--force", action="store_true", help="Принудительно переобработать все файлы")
     parser.add_argument("--dashboard", action="store_true", help="Создать данные для дашборда")
+    parser.add_argument("--sanctions", action="store_true", help="Проверить контрагентов по санкционным спискам")
     
     args = parser.parse_args()
     
@@ -249,7 +307,7 @@ def main():
     )
     
     # Обрабатываем все договоры
-    results = processor.process_all_contracts(force_reprocess=args.force)
+    results = processor.process_all_contracts(force_reprocess=args.force, screen_sanctions=args.sanctions)
     
     if results:
         print(f"\n✅ Обработка завершена: {len(results)} договоров")
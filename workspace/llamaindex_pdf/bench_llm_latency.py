@@ -0,0 +1,78 @@
+# bench_llm_latency.py
+import argparse
+import json
+import statistics
+import time
+
+import pdf_extraction
+from full_ocr_analyzer import OCRContractAnalyzer
+
+
+def load_contract(path):
+    """Текст договора: готовый .txt или извлечение из PDF"""
+    if path.lower().endswith('.txt'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return pdf_extraction.smart_extract_text(path)
+
+
+def measure(analyzer, contract_text, mode, runs):
+    """Задержки analyze_with_llama в секундах: первый вызов отдельно от повторных"""
+    latencies = []
+    for run in range(runs + 1):
+        start_time = time.perf_counter()
+        response = analyzer.analyze_with_llama(contract_text, mode=mode)
+        latencies.append(time.perf_counter() - start_time)
+        if response is None:
+            print(f"⚠️ {mode}: запрос {run + 1} завершился ошибкой")
+    repeated = latencies[1:]
+    return {
+        'first_s': round(latencies[0], 2),
+        'mean_s': round(statistics.mean(repeated), 2),
+        'median_s': round(statistics.median(repeated), 2),
+        'min_s': round(min(repeated), 2),
+        'runs': runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение задержки анализа: прямой запрос и одноразовый индекс")
+    parser.add_argument("contract", help="Договор (.txt или .pdf)")
+    parser.add_argument("--model", default="owl/t-lite", help="Модель Ollama")
+    parser.add_argument("--runs", type=int, default=3, help="Повторных запросов на режим (после первого)")
+    parser.add_argument("--modes", default="index,direct", help="Режимы через запятую")
+    parser.add_argument("--json", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    contract_text = load_contract(args.contract)
+    if not contract_text:
+        print("❌ Не удалось получить текст договора")
+        return
+
+    analyzer = OCRContractAnalyzer(model_name=args.model)
+    if not analyzer.load_regulations():
+        print("⚠️ Регламенты не загружены - промпт будет без обзора регламентов")
+
+    results = {}
+    for mode in args.modes.split(','):
+        print(f"\n⏱️ Режим {mode}: 1 + {args.runs} запросов...")
+        results[mode] = measure(analyzer, contract_text, mode, max(1, args.runs))
+
+    print(f"\n📊 Задержка analyze_with_llama ({args.model}, {len(contract_text)} символов):")
+    for mode, stats in results.items():
+        print(f"  {mode:7s} первый={stats['first_s']:.2f} с  среднее={stats['mean_s']:.2f} с  "
+              f"медиана={stats['median_s']:.2f} с  мин={stats['min_s']:.2f} с")
+    if 'index' in results and 'direct' in results and results['direct']['mean_s'] > 0:
+        speedup = results['index']['mean_s'] / results['direct']['mean_s']
+        saved = results['index']['mean_s'] - results['direct']['mean_s']
+        print(f"🚀 direct быстрее index в {speedup:.2f} раза ({saved:.2f} с на анализ)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'text_length': len(contract_text), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench_ocr.py
+import argparse
+import os
+import sys
+import time
+
+import ocr_engine
+
+
+def bench_backend(pdf_path, backend, dpi, pages, workers):
+    """Замер скорости OCR одного бэкенда: (страниц, секунд)"""
+    engine = ocr_engine.OCREngine(workers=workers, dpi=dpi, backend=backend)
+    if engine.backend != backend:
+        return None
+
+    # Прогрев: создание пула процессов и загрузка модели не входят в замер
+    engine.ocr_pdf(pdf_path, page_numbers=pages[:1])
+
+    start = time.perf_counter()
+    results = engine.ocr_pdf(pdf_path, page_numbers=pages)
+    elapsed = time.perf_counter() - start
+
+    engine.shutdown()
+    return len(results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение скорости OCR бэкендов (pytesseract / tesserocr)")
+    parser.add_argument("pdf_file", help="PDF файл для замера")
+    parser.add_argument("--pages", type=int, default=10, help="Количество страниц")
+    parser.add_argument("--dpi", type=int, default=200, help="DPI растеризации")
+    parser.add_argument("--workers", type=int, default=1, help="Процессов OCR")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf_file):
+        print(f"❌ Файл не найден: {args.pdf_file}")
+        sys.exit(1)
+
+    import pymupdf
+    with pymupdf.open(args.pdf_file) as doc:
+        pages = list(range(min(args.pages, len(doc))))
+
+    print(f"🚀 Замер OCR: {os.path.basename(args.pdf_file)}")
+    print(f"📄 Страниц: {len(pages)}, DPI: {args.dpi}, процессов: {args.workers}")
+    print("=" * 60)
+
+    results = {}
+    for backend in ("pytesseract", "tesserocr"):
+        measured = bench_backend(args.pdf_file, backend, args.dpi, pages, args.workers)
+        if measured is None:
+            print(f"⚠️ {backend}: не установлен, пропускаем")
+            continue
+        count, elapsed = measured
+        results[backend] = count / elapsed
+        print(f"⏱️ {backend}: {count} страниц за {elapsed:.2f} с - {results[backend]:.2f} стр/с")
+
+    if len(results) == 2:
+        print(f"\n📊 Ускорение tesserocr: x{results['tesserocr'] / results['pytesseract']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
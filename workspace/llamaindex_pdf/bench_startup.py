@@ -0,0 +1,116 @@
+# bench_startup.py
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+# Точки входа: сервер, утилиты и анализаторы, которые запускаются отдельно
+ENTRY_POINTS = ("fileServer", "check_pdf_type", "ocr_analyzer", "full_ocr_analyzer",
+                "fixed_analyzer", "langchain_ollama_analyzer")
+
+
+def parse_importtime(stderr, module):
+    """Вывод -X importtime: (время импорта модуля в мс, самые тяжелые импорты верхнего уровня)"""
+    total_ms = None
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # строка заголовка
+        cumulative_ms = int(parts[1]) / 1000
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == module and depth == 0:
+            total_ms = cumulative_ms
+        elif depth == 1:
+            top_level.append((cumulative_ms, name.strip()))
+    top_level.sort(reverse=True)
+    return total_ms, top_level
+
+
+def measure(module, cwd, runs):
+    """Лучший из runs запусков: {'import_ms', 'wall_ms', 'heaviest'} или {'error'}"""
+    best = None
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=cwd, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - start_time) * 1000
+        if proc.returncode != 0:
+            errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+            return {'error': errors[-1] if errors else f"код возврата {proc.returncode}"}
+
+        import_ms, top_level = parse_importtime(proc.stderr, module)
+        if best is None or wall_ms < best['wall_ms']:
+            best = {'import_ms': import_ms, 'wall_ms': wall_ms, 'heaviest': top_level[:5]}
+    return best
+
+
+def export_revision(revision, source_dir, target):
+    """Файлы папки source_dir в указанной ревизии git - для замера «до»"""
+    def git(*command):
+        return subprocess.run(["git", *command], cwd=source_dir, capture_output=True, check=True).stdout
+
+    # git archive с путем в ревизии запускаем из корня репозитория
+    prefix = git("rev-parse", "--show-prefix").decode().strip().rstrip('/')
+    root = git("rev-parse", "--show-toplevel").decode().strip()
+    archive = subprocess.run(["git", "archive", "--format=tar", f"{revision}:{prefix}"],
+                             cwd=root, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+
+
+def print_result(label, result):
+    if 'error' in result:
+        print(f"  {label:9s} ❌ {result['error']}")
+        return
+    print(f"  {label:9s} импорт {result['import_ms']:8.1f} мс, процесс {result['wall_ms']:8.1f} мс")
+    for cumulative_ms, name in result['heaviest']:
+        print(f"              {cumulative_ms:8.1f} мс  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время запуска точек входа (python -X importtime)")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Модули для замера")
+    parser.add_argument("--runs", type=int, default=3, help="Запусков на модуль (берется лучший)")
+    parser.add_argument("--baseline", help="Ревизия git для сравнения, например HEAD~1")
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline_dir = None
+    if args.baseline:
+        baseline_dir = tempfile.mkdtemp(prefix="bench_startup_")
+        export_revision(args.baseline, cwd, baseline_dir)
+        print(f"📦 Базовая версия {args.baseline}: {baseline_dir}")
+
+    print(f"🚀 Замер запуска: {len(args.modules)} модулей, лучший из {args.runs}")
+    print("=" * 60)
+    summary = []
+    for module in args.modules:
+        print(f"\n⏱️ {module}")
+        current = measure(module, cwd, args.runs)
+        baseline = measure(module, baseline_dir, args.runs) if baseline_dir else None
+        if baseline is not None:
+            print_result("до", baseline)
+        print_result("сейчас", current)
+        if baseline and 'error' not in baseline and 'error' not in current:
+            summary.append((module, baseline['wall_ms'], current['wall_ms']))
+
+    if summary:
+        print(f"\n📊 Время запуска процесса (до → сейчас):")
+        for module, before, after in summary:
+            print(f"  {module:28s} {before:8.1f} → {after:8.1f} мс  (x{before / after:.1f})")
+
+    if baseline_dir:
+        shutil.rmtree(baseline_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
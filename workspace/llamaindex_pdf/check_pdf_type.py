@@ -3,6 +3,30 @@ import pymupdf  # PyMuPDF
 import sys
 import os
 
+def classify_page(page):
+    """Определяем тип страницы: text, image или empty"""
+    # Проверяем текст
+    text = page.get_text()
+    
+    # Проверяем изображения
+    images = page.get_images()
+    
+    if len(text.strip()) > 50:  # Если есть значимый текст
+        return "text", text, images
+    elif images:
+        return "image", text, images
+    return "empty", text, images
+
+def classify_pdf_pages(pdf_path, page_numbers=None):
+    """Список типов страниц PDF (text/image/empty) в порядке страниц"""
+    doc = pymupdf.open(pdf_path)
+    try:
+        if page_numbers is not None:
+            return [classify_page(doc[page_num])[0] for page_num in page_numbers]
+        return [classify_page(page)[0] for page in doc]
+    finally:
+        doc.close()
+
 def check_pdf_content(pdf_path):
     """Проверяем содержит ли PDF текст или только изображения"""
     print(f"🔍 Анализ файла: {os.path.basename(pdf_path)}")
@@ -17,18 +41,13 @@ def check_pdf_content(pdf_path):
         
         for page_num in range(total_pages):
             page = doc[page_num]
-            
-            # Проверяем текст
-            text = page.get_text()
+            page_type, text, images = classify_page(page)
             text_length = len(text.strip())
             
-            # Проверяем изображения
-            images = page.get_images()
-            
-            if text_length > 50:  # Если есть значимый текст
+            if page_type == "text":
                 text_pages += 1
                 print(f"  📝 Страница {page_num + 1}: ТЕКСТ ({text_length} символов)")
-            elif images:
+            elif page_type == "image":
                 image_pages += 1
                 print(f"  🖼️ Страница {page_num + 1}: ИЗОБРАЖЕНИЕ ({len(images)} изображений)")
             else:
@@ -0,0 +1,147 @@
+# contract_mapreduce.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from legal_splitter import LegalTextSplitter
+
+# Раздел договора + инструкция + ответ должны поместиться в num_ctx=4096
+# (кириллица - примерно 2.5-3 символа на токен)
+MAP_SECTION_CHARS = int(os.environ.get("MAP_SECTION_CHARS", "4000"))
+# Объем выжимок, который уходит в итоговый запрос; больше - сворачиваем
+REDUCE_INPUT_CHARS = int(os.environ.get("REDUCE_INPUT_CHARS", "4000"))
+# Одновременных запросов к Ollama на процесс (Ollama обслуживает OLLAMA_NUM_PARALLEL)
+MAP_REDUCE_WORKERS = int(os.environ.get("MAP_REDUCE_WORKERS", "2"))
+MAP_REDUCE_ENABLED = os.environ.get("MAP_REDUCE", "1") != "0"
+
+# Лимит общий для всех анализов процесса: задачи из очереди не перегружают Ollama
+_llm_slots = threading.BoundedSemaphore(MAP_REDUCE_WORKERS)
+
+MAP_PROMPT = """Ты - эксперт по валютному контролю и санкционному законодательству.
+Перед тобой раздел {index} из {total} договора. Выпиши из него только факты, важные для проверки.
+
+РАЗДЕЛ ДОГОВОРА:
+{section}
+
+Ответь строго в формате (если сведений нет - пиши "нет"):
+СТОРОНЫ: [наименования, страны, адреса]
+БАНКИ: [банки сторон, SWIFT, счета]
+ПРЕДМЕТ: [товары/услуги, коды ТН ВЭД]
+ВАЛЮТА И ПЛАТЕЖИ: [валюта, сумма, условия и сроки оплаты]
+СРОКИ РЕПАТРИАЦИИ: [сроки поставки, возврата выручки или аванса]
+РИСКИ: [санкционные и валютные риски в этом разделе]
+"""
+
+COLLAPSE_PROMPT = """Объедини выписки из разделов договора в одну.
+Сохрани все наименования, банки, суммы, сроки и риски, убери повторы.
+
+ВЫПИСКИ:
+{findings}
+
+Ответь в том же формате: СТОРОНЫ, БАНКИ, ПРЕДМЕТ, ВАЛЮТА И ПЛАТЕЖИ, СРОКИ РЕПАТРИАЦИИ, РИСКИ.
+"""
+
+
+class MapReduceError(Exception):
+    pass
+
+
+def split_contract(text, section_chars=MAP_SECTION_CHARS):
+    """Договор -> разделы по границам статей и пунктов"""
+    splitter = LegalTextSplitter(chunk_size=section_chars, min_chunk_size=section_chars // 4)
+    return splitter.split_text(text)
+
+
+class ContractMapReduce:
+    def __init__(self, complete, section_chars=MAP_SECTION_CHARS,
+                 reduce_chars=REDUCE_INPUT_CHARS, workers=MAP_REDUCE_WORKERS):
+        # complete(prompt) -> str: вызов LLM конкретного анализатора
+        self.complete = complete
+        self.section_chars = section_chars
+        self.reduce_chars = reduce_chars
+        self.workers = workers
+
+    def needs_map_reduce(self, text):
+        """Короткий договор целиком помещается в один запрос"""
+        return len(text) > self.section_chars
+
+    def _call(self, prompt):
+        with _llm_slots:
+            return str(self.complete(prompt)).strip()
+
+    def map_section(self, index, total, section):
+        """Выписка фактов из одного раздела"""
+        try:
+            return self._call(MAP_PROMPT.format(index=index, total=total, section=section))
+        except Exception as e:
+            # Решение по договору без части разделов недопустимо - анализ завершается ошибкой
+            print(f"⚠️ Ошибка анализа раздела {index}/{total}: {e}")
+            raise MapReduceError(f"Раздел {index}/{total} не проанализирован: {e}") from e
+
+    def _parallel(self, func, items):
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="map")
+        try:
+            return list(executor.map(lambda args: func(*args), items))
+        finally:
+            # После ошибки оставшиеся разделы не отправляем: сводка все равно не будет собрана
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def collapse(self, findings):
+        """Сворачиваем выписки, пока они не поместятся в итоговый запрос"""
+        while len(findings) > 1 and sum(len(f) for f in findings) > self.reduce_chars:
+            groups, group, length = [], [], 0
+            for finding in findings:
+                if group and length + len(finding) > self.reduce_chars:
+                    groups.append(group)
+                    group, length = [], 0
+                group.append(finding)
+                length += len(finding)
+            groups.append(group)
+            if len(groups) == len(findings):
+                # Каждая выписка сама больше лимита - объединяем попарно
+                groups = [findings[i:i + 2] for i in range(0, len(findings), 2)]
+
+            print(f"🔁 Сворачиваем {len(findings)} выписок в {len(groups)}")
+            findings = self._parallel(
+                lambda group: self._call(COLLAPSE_PROMPT.format(findings="\n\n".join(group))),
+                [(group,) for group in groups]
+            )
+        return findings
+
+    def run(self, text):
+        """Map: выписки по всем разделам; reduce: одна сводка для итогового решения"""
+        start_time = time.time()
+        sections = split_contract(text, self.section_chars)
+        total = len(sections)
+        print(f"🧩 Map-reduce: {total} разделов по ≤{self.section_chars} символов, "
+              f"параллельно {self.workers}")
+
+        findings = self._parallel(self.map_section,
+                                  [(i, total, section) for i, section in enumerate(sections, 1)])
+        map_time = time.time() - start_time
+        labelled = [f"[Раздел {i}/{total}]\n{finding}" for i, finding in enumerate(findings, 1)]
+        summary = "\n\n".join(self.collapse(labelled))
+
+        elapsed = time.time() - start_time
+        print(f"⏱️ Map {map_time:.1f} с, всего {elapsed:.1f} с; сводка {len(summary)} символов")
+        return {
+            'sections': total,
+            'summary': summary,
+            'map_time': round(map_time, 2),
+            'total_time': round(elapsed, 2)
+        }
+
+
+def prepare_contract_input(text, complete, enabled=MAP_REDUCE_ENABLED, fallback_chars=MAP_SECTION_CHARS):
+    """Текст договора для итогового запроса: целиком, сводка map-reduce или (если выключено) начало"""
+    mapper = ContractMapReduce(complete)
+    if not mapper.needs_map_reduce(text):
+        return text, None
+    if not enabled:
+        return text[:fallback_chars], None
+
+    result = mapper.run(text)
+    contract_input = ("СВОДКА ПО ВСЕМ РАЗДЕЛАМ ДОГОВОРА "
+                      f"({result['sections']} разделов, {len(text)} символов):\n{result['summary']}")
+    return contract_input, result
@@ -0,0 +1,105 @@
+# embedding_pipeline.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+from sentence_transformers import SentenceTransformer
+from langchain.embeddings.base import Embeddings
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_BATCH_SIZE = 64
+# Меньше этого числа текстов пул процессов не окупает пересылку данных
+MIN_PARALLEL_TEXTS = 256
+
+# Модель рабочего процесса - загружается один раз в initializer
+_worker_model = None
+
+
+def _init_worker(model_name, device, threads):
+    """Инициализация рабочего процесса: своя копия модели и свой лимит потоков"""
+    global _worker_model
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device=device)
+
+
+def _encode_block(texts, batch_size, normalize):
+    """Эмбеддинг блока текстов в рабочем процессе"""
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=normalize,
+        show_progress_bar=False
+    )
+    return vectors.tolist()
+
+
+class BatchedEmbeddings(Embeddings):
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, device='cpu', normalize=True,
+                 batch_size=None, threads=None, workers=None):
+        # Размер батча, потоки torch и число процессов задаются через окружение контейнера
+        self.model_name = model_name
+        self.device = device
+        self.normalize = normalize
+        self.batch_size = batch_size or int(os.environ.get("EMBED_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.threads = threads or int(os.environ.get("EMBED_THREADS", "0")) or os.cpu_count() or 1
+        self.workers = workers or int(os.environ.get("EMBED_WORKERS", "1"))
+
+        torch.set_num_threads(self.threads)
+        self.model = SentenceTransformer(model_name, device=device)
+        self._executor = None
+
+    def _get_executor(self):
+        """Пул процессов создается лениво, по одной модели на процесс"""
+        if self._executor is None:
+            # Ядра делятся между процессами, чтобы потоки torch не переподписывали CPU
+            worker_threads = max(1, self.threads // self.workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.device, worker_threads)
+            )
+        return self._executor
+
+    def _encode(self, texts):
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        """Эмбеддинг фрагментов батчами (в пуле процессов для больших объемов)"""
+        texts = [text.replace("\n", " ") for text in texts]
+        if not texts:
+            return []
+
+        start_time = time.time()
+        if self.workers > 1 and len(texts) >= MIN_PARALLEL_TEXTS:
+            # Каждому процессу - непрерывный блок, порядок восстанавливается map
+            block = -(-len(texts) // self.workers)
+            blocks = [texts[i:i + block] for i in range(0, len(texts), block)]
+            executor = self._get_executor()
+            vectors = []
+            for part in executor.map(_encode_block, blocks,
+                                     [self.batch_size] * len(blocks),
+                                     [self.normalize] * len(blocks)):
+                vectors.extend(part)
+        else:
+            vectors = self._encode(texts)
+
+        elapsed = time.time() - start_time
+        rate = len(texts) / elapsed if elapsed > 0 else 0.0
+        print(f"🧮 Эмбеддинги: {len(texts)} фрагментов за {elapsed:.1f} с ({rate:.1f} фрагм./с)")
+        return vectors
+
+    def embed_query(self, text):
+        """Эмбеддинг запроса - всегда в текущем процессе"""
+        return self._encode([text.replace("\n", " ")])[0]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -9,12 +9,13 @@ from pathlib import Path
 
 # PDF и OCR обработка
 import pymupdf4llm
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
+import ocr_engine
+import pdf_extraction
+from keyword_scanner import get_scanner
+from contract_mapreduce import prepare_contract_input, MAP_REDUCE_ENABLED
+from ollama_langchain import PooledOllama
 
 # LangChain компоненты
-from langchain.llms import Ollama
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -26,13 +27,15 @@ from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 
 # Отключаем предупреждения
 warnings.filterwarnings("ignore")
-Image.MAX_IMAGE_PIXELS = None
 
 class EnhancedContractAnalyzer:
-    def __init__(self, regulations_path="./regulations", model_name="qwen2.5:3b-instruct"):
+    def __init__(self, regulations_path="./regulations", model_name="qwen2.5:3b-instruct",
+                 map_reduce=MAP_REDUCE_ENABLED):
         self.regulations_path = regulations_path
         self.model_name = model_name
+        self.map_reduce = map_reduce
         self.llm = None
+        self.map_llm = None
         self.embeddings = None
         self.vectorstore = None
         self.regulations_summary = ""  # Сводка всех регламентов
@@ -88,36 +91,10 @@ class EnhancedContractAnalyzer:
             'procedures': []
         }
         
-        content_lower = content.lower()
-        lines = content.split('\n')
-        
-        # Ищем ключевые разделы
-        for line in lines:
-            line_clean = line.strip()
-            if len(line_clean) < 10:
-                continue
-                
-            line_lower = line_clean.lower()
-            
-            # Санкционные списки и ограничения
-            if any(word in line_lower for word in ['санкци', 'запрет', 'ограничен', 'блокир', 'заморож']):
-                key_info['sanctions'].append(line_clean)
-            
-            # Валютное регулирование
-            elif any(word in line_lower for word in ['валют', 'курс', 'экспорт', 'импорт', 'девиз']):
-                key_info['currency_rules'].append(line_clean)
-            
-            # Запрещенные товары
-            elif any(word in line_lower for word in ['двойного назначения', 'оружи', 'военн', 'технологи']):
-                key_info['prohibited_items'].append(line_clean)
-            
-            # Процедуры и требования
-            elif any(word in line_lower for word in ['требуется', 'необходимо', 'обязан', 'должен']):
-                key_info['procedures'].append(line_clean)
-            
-            # Статьи и пункты
-            elif any(pattern in line_lower for pattern in ['статья', 'пункт', 'часть', 'подпункт']):
-                key_info['key_points'].append(line_clean)
+        # Ищем ключевые разделы: один проход автомата по всему документу,
+        # строка относится к первой по приоритету категории (порядок в keywords.json)
+        for line_clean, category in get_scanner("regulation_sections").classify_lines(content):
+            key_info[category].append(line_clean)
         
         # Ограничиваем количество элементов
         for key in key_info:
@@ -224,9 +201,11 @@ class EnhancedContractAnalyzer:
             
             callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
             
-            self.llm = Ollama(
+            # Запросы идут через общий пул соединений Ollama
+            self.llm = PooledOllama(
                 model=self.model_name,
                 callback_manager=callback_manager,
+                streaming=True,
                 temperature=0.1,
                 num_ctx=8192,  # Увеличиваем контекст для регламентов
                 num_predict=1024,
@@ -235,6 +214,17 @@ class EnhancedContractAnalyzer:
                 repeat_penalty=1.1,
                 system=system_prompt  # Встраиваем регламенты в систему
             )
+            # Выписки по разделам договора: без нормативной базы в системном промпте,
+            # без вывода в консоль (запросы идут параллельно)
+            self.map_llm = PooledOllama(
+                model=self.model_name,
+                temperature=0.1,
+                num_ctx=4096,
+                num_predict=512,
+                top_k=40,
+                top_p=0.9,
+                repeat_penalty=1.1
+            )
             
             print("✅ LLM настроен с встроенными регламентами")
             
@@ -244,53 +234,37 @@ class EnhancedContractAnalyzer:
     
     def extract_text_with_ocr(self, pdf_path):
         """OCR извлечение текста"""
-        print(f"🔍 OCR обработка: {os.path.basename(pdf_path)}")
-        
-        try:
-            images = convert_from_path(pdf_path, dpi=200, thread_count=4)
-            all_text = []
-            
-            for i, image in enumerate(images):
-                print(f"🔤 OCR страница {i+1}/{len(images)}...")
-                custom_config = r'--oem 3 --psm 6 -l rus+eng'
-                text = pytesseract.image_to_string(image, config=custom_config)
-                
-                if text.strip():
-                    all_text.append(f"=== Страница {i+1} ===\n{text}")
-                del image
-            
-            combined_text = "\n\n".join(all_text)
-            print(f"✅ OCR завершен: {len(combined_text)} символов")
-            return combined_text
-            
-        except Exception as e:
-            print(f"❌ Ошибка OCR: {e}")
-            return None
+        # DPI выбирается адаптивно, страницы распределяются по пулу процессов
+        return ocr_engine.extract_text_with_ocr(pdf_path)
     
     def smart_extract_text(self, pdf_path):
         """Умное извлечение текста"""
-        try:
-            text = pymupdf4llm.to_markdown(pdf_path)
-            if len(text.strip()) > 100:
-                print(f"✅ Стандартное извлечение: {len(text)} символов")
-                return text
-            else:
-                print("⚠️ Мало текста, используем OCR...")
-        except Exception as e:
-            print(f"⚠️ Ошибка стандартного извлечения: {e}")
-        
-        return self.extract_text_with_ocr(pdf_path)
+        return pdf_extraction.smart_extract_text(pdf_path)
+    
+    def smart_extract(self, pdf_path):
+        """Умное извлечение текста: (текст, способ извлечения по метаданным страниц)"""
+        text, pages = pdf_extraction.smart_extract(pdf_path)
+        return text, pdf_extraction.extraction_method(pages)
     
     def analyze_contract_direct(self, contract_text):
         """Прямой анализ договора LLM с встроенными регламентами"""
         print("🤖 Запуск анализа с встроенными регламентами...")
         
+        try:
+            # Длинный договор проверяем целиком: выписки по разделам сворачиваются в сводку
+            contract_input, _ = prepare_contract_input(
+                contract_text, self.map_llm, enabled=self.map_reduce, fallback_chars=6000
+            )
+        except Exception as e:
+            print(f"❌ Ошибка анализа разделов договора: {e}")
+            return f"Ошибка анализа: {str(e)}"
+        
         # Подготавливаем промпт для анализа
         analysis_prompt = f"""
 Проанализируй следующий договор на соответствие нормативной базе:
 
 ТЕКСТ ДОГОВОРА:
-{contract_text[:6000]}  # Первые 6000 символов
+{contract_input}
 
 ОСОБОЕ ВНИМАНИЕ:
 1. Проверь стороны договора по санкционным спискам
@@ -318,7 +292,7 @@ class EnhancedContractAnalyzer:
         print(f"{'='*80}")
         
         # 1. Извлекаем текст договора
-        contract_text = self.smart_extract_text(contract_path)
+        contract_text, extraction_method = self.smart_extract(contract_path)
         if not contract_text:
             print("❌ Не удалось извлечь текст договора")
             return None
@@ -368,7 +342,7 @@ class EnhancedContractAnalyzer:
             'regulations_embedded': True,
             'regulations_size': len(self.regulations_summary),
             'llm_analysis': llm_response,
-            'extraction_method': 'OCR' if '=== Страница' in contract_text else 'Standard'
+            'extraction_method': extraction_method
         }
         
         # 5. Выводим результаты
@@ -438,6 +412,8 @@ def main():
     parser.add_argument("pdf_file", help="PDF файл договора")
     parser.add_argument("--model", default="qwen2.5:3b-instruct", help="Модель Ollama")
     parser.add_argument("--regulations", default="./regulations", help="Папка с регламентами")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Без map-reduce: анализировать только начало длинного договора")
     
     args = parser.parse_args()
     
@@ -447,7 +423,8 @@ def main():
     
     analyzer = EnhancedContractAnalyzer(
         regulations_path=args.regulations,
-        model_name=args.model
+        model_name=args.model,
+        map_reduce=not args.single_pass
     )
     
     result = analyzer.analyze_contract(args.pdf_file)
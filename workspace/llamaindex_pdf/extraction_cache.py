@@ -0,0 +1,116 @@
+# extraction_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get("EXTRACTION_CACHE_DIR", "./extraction_cache")
+DEFAULT_MAX_MB = int(os.environ.get("EXTRACTION_CACHE_MAX_MB", "500"))
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """SHA-256 содержимого файла (читаем блоками)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, pdf_path, settings):
+        """Ключ кэша: SHA-256 байтов PDF и настроек (DPI, конфиг tesseract, язык, режим)"""
+        settings_json = json.dumps({'version': CACHE_VERSION, **settings}, sort_keys=True)
+        digest = hashlib.sha256()
+        digest.update(file_sha256(pdf_path).encode())
+        digest.update(settings_json.encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Читаем запись из кэша (None если нет)"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # mtime используется как время последнего обращения для LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, text, pages, settings, source=None):
+        """Сохраняем текст и постраничные метаданные"""
+        entry = {
+            'key': key,
+            'source': source,
+            'settings': settings,
+            'created': time.time(),
+            'text_length': len(text),
+            'pages': pages,
+            'text': text
+        }
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        # Атомарная замена - параллельные читатели не увидят недописанный файл
+        os.replace(tmp_path, path)
+
+        self.evict()
+        return entry
+
+    def evict(self):
+        """Удаляем давно не использованные записи, пока кэш больше лимита"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                    total -= size
+                    print(f"🧹 Кэш извлечения: удалена запись {os.path.basename(path)}")
+                except OSError:
+                    pass
+                if total <= self.max_bytes:
+                    break
+
+
+_cache = None
+
+
+def get_extraction_cache():
+    """Общий кэш извлечения для всех анализаторов процесса"""
+    global _cache
+    if _cache is None:
+        _cache = ExtractionCache()
+    return _cache
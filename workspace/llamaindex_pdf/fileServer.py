@@ -1,7 +1,10 @@
 from flask import Flask, request, jsonify
+from werkzeug.utils import secure_filename
 import os
-from ocr_analyzer import analyze_contract_with_ocr
-from langchain_ollama_analyzer import mainLangChain
+import time
+from job_queue import JobQueue, QueueFullError
+from sanctions_screening import get_sanctions_index, get_sanctions_manager
+from ollama_client import get_ollama_client
 
 app = Flask(__name__)
 
@@ -22,7 +25,10 @@ def upload_file():
     if file:
         filename = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
         file.save(filename)
-        response =main(os.path.abspath(filename))  # Call the main function with the filename without extension
+        try:
+            response =main(os.path.abspath(filename))  # Call the main function with the filename without extension
+        except Exception:
+            response = None  # синхронная загрузка отвечает как раньше: resultInfo = null
         return jsonify({'message': 'File uploaded successfully', 'filename': filename,
                         'resultInfo':response}), 200
     else:
@@ -46,7 +52,11 @@ def main(name):
         # print("\nPreview of extracted text:")
         # print(extracted_text[:500] + "...")
 
+        # Анализатор импортируется при первом анализе: сервер стартует без LangChain и моделей
+        from langchain_ollama_analyzer import mainLangChain
         fileName = mainLangChain(name)
+        if not fileName:
+            raise RuntimeError("Анализ завершился с ошибками")
         content=''
         with open(fileName, 'r') as file:
             content = file.read()
@@ -54,5 +64,119 @@ def main(name):
 
     except Exception as e:
         print(f"Error: {str(e)}")
+        # Причина уходит в задачу очереди (поле error в /jobs/<id>)
+        raise
+
+
+def safe_upload_name(original):
+    """Имя файла без путей; secure_filename убирает кириллицу, поэтому расширение сохраняем отдельно"""
+    stem, extension = os.path.splitext(original.replace('\\', '/').rsplit('/', 1)[-1])
+    extension = secure_filename(extension)
+    return (secure_filename(stem) or "upload") + (f".{extension}" if extension else "")
+
+
+def analyze_upload(name):
+    """Анализ загруженного через /jobs файла; после анализа файл удаляется"""
+    try:
+        return main(name)
+    finally:
+        if os.path.exists(name):
+            os.remove(name)
+
+
+# Асинхронный анализ: POST возвращает job_id сразу, результат - через GET /jobs/<id>
+jobs = JobQueue(analyze_upload)
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file part'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+
+    # Имя очищается от путей ("../"), префикс не дает параллельным загрузкам
+    # с одинаковым именем перезаписать друг друга
+    filename = os.path.join(app.config['UPLOAD_FOLDER'], f"{os.urandom(4).hex()}_{safe_upload_name(file.filename)}")
+    file.save(filename)
+    try:
+        job_id = jobs.submit(os.path.abspath(filename))
+    except QueueFullError as e:
+        os.remove(filename)
+        return jsonify({'error': str(e)}), 429, {'Retry-After': '30'}
+
+    return jsonify({'job_id': job_id, 'status': 'queued', 'filename': filename}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'resultInfo': job['result'],
+        'error': job['error'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished']
+    }), 200
+
+
+@app.route('/jobs', methods=['GET'])
+def jobs_stats():
+    return jsonify(jobs.stats()), 200
+
+
+@app.route('/screen', methods=['POST'])
+def screen():
+    # {"names": [...]} - стороны договора, {"text": "..."} - поиск названий в тексте
+    payload = request.get_json(silent=True) or {}
+    names = payload.get('names') or []
+    text = payload.get('text') or ''
+    if not names and not text:
+        return jsonify({'error': 'Expected "names" list or "text"'}), 400
+
+    # Снимок индекса берется один раз: замена при перезагрузке не влияет на запрос
+    index = get_sanctions_index()
+    if index is None:
+        return jsonify({'error': 'Sanctions lists are not loaded'}), 503
+
+    start_time = time.perf_counter()
+    result = {'names': index.screen_names(names)}
+    if text:
+        result['text'] = index.screen_text(text)
+    result['hit'] = any(result['names'].values()) or bool(result.get('text'))
+    result['elapsed_ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+    result['index_version'] = index.version
+    return jsonify(result), 200
+
+
+@app.route('/screen/status', methods=['GET'])
+def screen_status():
+    return jsonify(get_sanctions_manager().status()), 200
+
+
+@app.route('/ollama/status', methods=['GET'])
+def ollama_status():
+    # Проверка /api/tags кэшируется клиентом (OLLAMA_HEALTH_TTL) - частый опрос не нагружает Ollama
+    status = get_ollama_client().status()
+    return jsonify(status), 200 if status['health']['ok'] else 503
+
+
 if __name__ == '__main__':
+    # Прогреваем анализатор до первого запроса: модель эмбеддингов,
+    # клиент Ollama и векторная база загружаются один раз на процесс.
+    # В режиме debug сервер работает в дочернем процессе reloader-а - прогреваем только его
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Санкционные списки не зависят от анализатора - /screen работает и без Ollama
+        get_sanctions_manager()
+        try:
+            from langchain_ollama_analyzer import get_analyzer
+            get_analyzer()
+        except Exception as e:
+            # Сервер поднимается без анализатора: он будет создан при первой задаче
+            print(f"⚠️ Анализатор не прогрет ({e}), загрузка отложена до первого анализа")
     app.run(debug=True, port=8081)
\ No newline at end of file
@@ -1,5 +1,4 @@
 # fixed_analyzer.py
-import pymupdf4llm
 import sys
 import os
 import argparse
@@ -9,10 +8,17 @@ import json
 # Принудительно отключаем OpenAI и используем локальные модели
 os.environ['OPENAI_API_KEY'] = ''
 
-try:
-    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings, Document
-    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-    from llama_index.llms.ollama import Ollama
+
+def setup_local_models():
+    """Настройка локальных моделей при первом анализе (импорт модуля их не загружает)"""
+    try:
+        from llama_index.core import Settings
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        from llama_index.llms.ollama import Ollama
+    except ImportError as e:
+        print(f"❌ Ошибка импорта: {e}")
+        print("Установите: pip install llama-index sentence-transformers")
+        return False
     
     # Настройка локальных моделей
     Settings.embed_model = HuggingFaceEmbedding(
@@ -21,16 +27,17 @@ try:
     Settings.llm = Ollama(model="llama3.1:8b", request_timeout=120.0)
     
     print("✅ Локальные модели настроены")
-    
-except ImportError as e:
-    print(f"❌ Ошибка импорта: {e}")
-    print("Установите: pip install llama-index sentence-transformers")
-    sys.exit(1)
+    return True
 
 def simple_contract_analysis(pdf_path, regulations_path="./regulations"):
     """Упрощенный анализ договора"""
     print(f"🚀 Анализ договора: {os.path.basename(pdf_path)}")
     
+    if not setup_local_models():
+        return
+    import pymupdf4llm
+    from llama_index.core import VectorStoreIndex, Document
+    
     # 1. Читаем PDF договора
     print("📄 Извлечение текста из PDF...")
     try:
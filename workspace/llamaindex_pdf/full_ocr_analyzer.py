@@ -1,41 +1,47 @@
 # full_ocr_analyzer.py
-import pymupdf4llm
-import pymupdf
-import pytesseract
-from pdf2image import convert_from_path
+import importlib.util
 import sys
 import os
 import argparse
 from datetime import datetime
-from PIL import Image
-import tempfile
 import json
+import threading
 import warnings
+from keyword_scanner import get_scanner
+from prompt_budget import get_token_counter, SAFETY_TOKENS
+from ollama_client import get_ollama_client
 
-# Отключаем предупреждения о размере изображений
+# Отключаем предупреждения
 warnings.filterwarnings("ignore", category=UserWarning)
-Image.MAX_IMAGE_PIXELS = None
 
 # Настройки для локальных моделей
 os.environ['OPENAI_API_KEY'] = ''
 
-try:
-    from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings, Document
-    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-    from llama_index.llms.ollama import Ollama
-    
-    # Настройка локальных моделей
-    Settings.embed_model = HuggingFaceEmbedding(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
-    Settings.llm = Ollama(model="lowl/t-lite", request_timeout=360.0)
-    
-    LLAMA_INDEX_AVAILABLE = True
-    print("✅ LlamaIndex настроен с локальными моделями")
-    
-except ImportError as e:
-    print(f"⚠️ LlamaIndex не доступен: {e}")
-    LLAMA_INDEX_AVAILABLE = False
+# LlamaIndex, клиенты и модели загружаются при первом LLM анализе, а не при импорте модуля
+LLAMA_INDEX_AVAILABLE = importlib.util.find_spec("llama_index") is not None
+
+# direct - запрос напрямую к модели; index - прежний путь через одноразовый VectorStoreIndex
+LLAMA_ANALYSIS_MODE = os.environ.get("LLAMA_ANALYSIS_MODE", "direct")
+LLM_NUM_CTX = 4096  # Уменьшаем контекст для экономии памяти
+LLM_NUM_PREDICT = 512  # Ограничиваем длину ответа
+
+_settings_lock = threading.Lock()
+_embed_model_ready = False
+
+
+def setup_embed_model():
+    """Локальная модель эмбеддингов LlamaIndex (нужна только пути через индекс)"""
+    global _embed_model_ready
+    with _settings_lock:
+        if not _embed_model_ready:
+            from llama_index.core import Settings
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+            
+            Settings.embed_model = HuggingFaceEmbedding(
+                model_name="sentence-transformers/all-MiniLM-L6-v2"
+            )
+            _embed_model_ready = True
+            print("✅ LlamaIndex настроен с локальными моделями")
 
 class OCRContractAnalyzer:
     def __init__(self, regulations_path="./regulations", model_name="owl/t-lite"):
@@ -45,57 +51,20 @@ class OCRContractAnalyzer:
         
     def extract_text_with_ocr(self, pdf_path):
         """Извлекаем текст с помощью OCR для отсканированных документов"""
-        print(f"🔍 OCR обработка файла: {os.path.basename(pdf_path)}")
-        
-        try:
-            # Конвертируем PDF в изображения
-            print("📷 Конвертация PDF в изображения...")
-            images = convert_from_path(pdf_path, dpi=300, thread_count=4)
-            
-            all_text = []
-            
-            for i, image in enumerate(images):
-                print(f"🔤 OCR обработка страницы {i+1}/{len(images)}...")
-                
-                # Настройки для русского и английского языков
-                custom_config = r'--oem 3 --psm 6 -l rus+eng'
-                
-                # Извлекаем текст
-                text = pytesseract.image_to_string(image, config=custom_config)
-                
-                if text.strip():
-                    all_text.append(f"=== Страница {i+1} ===\n{text}")
-                    print(f"✅ Страница {i+1}: извлечено {len(text)} символов")
-                else:
-                    print(f"⚠️ Страница {i+1}: текст не найден")
-            
-            combined_text = "\n\n".join(all_text)
-            print(f"✅ OCR завершен. Всего извлечено: {len(combined_text)} символов")
-            
-            return combined_text
-            
-        except Exception as e:
-            print(f"❌ Ошибка OCR: {e}")
-            return None
+        # Страницы распределяются по пулу процессов общего OCR движка
+        import ocr_engine
+        return ocr_engine.extract_text_with_ocr(pdf_path)
 
     def smart_extract_text(self, pdf_path):
-        """Умное извлечение текста - сначала пробуем обычный способ, потом OCR"""
-        print(f"📄 Извлечение текста из: {os.path.basename(pdf_path)}")
-        
-        # Сначала пробуем обычное извлечение
-        try:
-            text = pymupdf4llm.to_markdown(pdf_path)
-            if len(text.strip()) > 100:  # Если извлекли достаточно текста
-                print(f"✅ Обычное извлечение: {len(text)} символов")
-                return text
-            else:
-                print("⚠️ Мало текста при обычном извлечении, используем OCR...")
-        except Exception as e:
-            print(f"⚠️ Ошибка обычного извлечения: {e}")
-            print("🔄 Переходим к OCR...")
-        
-        # Используем OCR
-        return self.extract_text_with_ocr(pdf_path)
+        """Умное извлечение текста - текстовый слой где он есть, OCR для сканов"""
+        import pdf_extraction
+        return pdf_extraction.smart_extract_text(pdf_path)
+
+    def smart_extract(self, pdf_path):
+        """Умное извлечение текста: (текст, способ извлечения по метаданным страниц)"""
+        import pdf_extraction
+        text, pages = pdf_extraction.smart_extract(pdf_path)
+        return text, pdf_extraction.extraction_method(pages)
 
     def load_regulations(self):
         """Загружаем регламенты - сначала пробуем обработанные, потом исходные"""
@@ -177,34 +146,12 @@ class OCRContractAnalyzer:
         """Простой анализ на основе ключевых слов"""
         print("🔍 Анализ на основе ключевых слов...")
         
-        # Ключевые слова для поиска проблем
-        sanctions_keywords = [
-            'санкци', 'запрет', 'ограничен', 'блокир', 'заморож',
-            'черный список', 'персона нон грата', 'эмбарго'
-        ]
-        
-        currency_keywords = [
-            'доллар', 'евро', 'фунт', 'юань', 'валют', 'девиз',
-            'курс валют', 'валютн', 'экспорт', 'импорт'
-        ]
-        
-        contract_keywords = [
-            'договор', 'контракт', 'соглашен', 'сторон', 'покупател',
-            'продавец', 'поставщик', 'заказчик', 'подрядчик'
-        ]
-        
-        risk_keywords = [
-            'оружие', 'военн', 'двойного назначения', 'технологи',
-            'программное обеспечение', 'криптограф', 'ядерн'
-        ]
-        
-        text_lower = contract_text.lower()
-        
-        # Поиск ключевых слов
-        found_sanctions = [kw for kw in sanctions_keywords if kw in text_lower]
-        found_currency = [kw for kw in currency_keywords if kw in text_lower]
-        found_contract = [kw for kw in contract_keywords if kw in text_lower]
-        found_risks = [kw for kw in risk_keywords if kw in text_lower]
+        # Все категории из keywords.json ищутся одним проходом автомата
+        found = get_scanner("contract_screening").find_keywords(contract_text)
+        found_sanctions = found['sanctions']
+        found_currency = found['currency']
+        found_contract = found['contract']
+        found_risks = found['risks']
         
         # Анализ результатов
         analysis = {
@@ -222,32 +169,15 @@ class OCRContractAnalyzer:
         
         return analysis
 
-    def analyze_with_llama(self, contract_text):
-        """Анализ с использованием LlamaIndex"""
-        if not LLAMA_INDEX_AVAILABLE:
-            print("⚠️ LlamaIndex не доступен, используем упрощенный анализ")
-            return None
-        
-        print(f"🤖 Анализ с использованием {self.model_name}...")
-        
-        try:
-            # Настройка более легкой модели
-            Settings.llm = Ollama(
-                model=self.model_name, 
-                request_timeout=180.0,
-                temperature=0.1,
-                num_ctx=4096,  # Уменьшаем контекст для экономии памяти
-                num_predict=512  # Ограничиваем длину ответа
-            )
-            
-            # Подготавливаем сокращенный контекст с регламентами
-            regulations_context = "\n\n".join([
-                f"=== {filename} ===\n{text[:2000]}"  # Сильно ограничиваем размер каждого регламента
-                for filename, text in list(self.regulations_texts.items())[:5]  # Только первые 5 регламентов
-            ])
-            
-            # Создаем короткий документ для анализа
-            analysis_prompt = f"""
+    def build_analysis_prompt(self, contract_text):
+        """Промпт быстрого анализа: краткий обзор регламентов и договор"""
+        # Подготавливаем сокращенный контекст с регламентами
+        regulations_context = "\n\n".join([
+            f"=== {filename} ===\n{text[:2000]}"  # Сильно ограничиваем размер каждого регламента
+            for filename, text in list(self.regulations_texts.items())[:5]  # Только первые 5 регламентов
+        ])
+        
+        return f"""
 РЕГЛАМЕНТЫ (краткий обзор):
 {regulations_context[:3000]}
 
@@ -261,35 +191,76 @@ class OCRContractAnalyzer:
 
 Ответ должен быть коротким и конкретным.
 """
+
+    def fit_contract(self, contract_text):
+        """Договор в пределах контекста модели (иначе Ollama молча обрежет промпт)"""
+        counter = get_token_counter(self.model_name)
+        fixed = counter.count(self.build_analysis_prompt(""))
+        budget = LLM_NUM_CTX - LLM_NUM_PREDICT - SAFETY_TOKENS - fixed
+        return counter.truncate(contract_text, budget)
+
+    def analyze_with_llama(self, contract_text, mode=None):
+        """Анализ с использованием LlamaIndex"""
+        mode = mode or LLAMA_ANALYSIS_MODE
+        if mode == "index" and not LLAMA_INDEX_AVAILABLE:
+            print("⚠️ LlamaIndex не доступен, используем упрощенный анализ")
+            return None
+        
+        print(f"🤖 Анализ с использованием {self.model_name} ({mode})...")
+        
+        try:
+            if mode == "index":
+                return self.analyze_with_index(contract_text)
             
-            # Создаем индекс
-            doc = Document(text=analysis_prompt)
-            index = VectorStoreIndex.from_documents([doc])
-            
-            # Запрашиваем анализ
-            query_engine = index.as_query_engine(
-                similarity_top_k=2,  # Уменьшаем количество источников
-                response_mode="compact"  # Компактный режим
-            )
-            
-            response = query_engine.query(
-                "Дай краткое заключение о договоре"
-            )
-            
-            return str(response)
+            # Прямой запрос через общий пул соединений: без эмбеддинга промпта и поиска по нему
+            prompt = self.build_analysis_prompt(self.fit_contract(contract_text))
+            options = {'temperature': 0.1, 'num_ctx': LLM_NUM_CTX, 'num_predict': LLM_NUM_PREDICT}
+            return get_ollama_client().complete(self.model_name, prompt, options)
             
         except Exception as e:
             print(f"❌ Ошибка LLM анализа: {e}")
             print("💡 Попробуйте использовать более легкую модель: ollama pull llama3.2:3b")
             return None
 
-    def generate_report(self, contract_path, contract_text, keyword_analysis, llm_analysis=None):
+    def analyze_with_index(self, contract_text):
+        """Прежний путь: одноразовый индекс из промпта и запрос к нему (для сравнения)"""
+        from llama_index.core import VectorStoreIndex, Settings, Document
+        from llama_index.llms.ollama import Ollama
+        
+        setup_embed_model()
+        # Настройка более легкой модели
+        Settings.llm = Ollama(
+            model=self.model_name, 
+            request_timeout=180.0,
+            temperature=0.1,
+            num_ctx=4096,  # Уменьшаем контекст для экономии памяти
+            num_predict=512  # Ограничиваем длину ответа
+        )
+        
+        # Создаем индекс
+        doc = Document(text=self.build_analysis_prompt(contract_text))
+        index = VectorStoreIndex.from_documents([doc])
+        
+        # Запрашиваем анализ
+        query_engine = index.as_query_engine(
+            similarity_top_k=2,  # Уменьшаем количество источников
+            response_mode="compact"  # Компактный режим
+        )
+        
+        response = query_engine.query(
+            "Дай краткое заключение о договоре"
+        )
+        
+        return str(response)
+
+    def generate_report(self, contract_path, contract_text, keyword_analysis, llm_analysis=None,
+                        extraction_method='Standard'):
         """Создаем итоговый отчет"""
         report = {
             'contract_file': os.path.basename(contract_path),
             'analysis_date': datetime.now().isoformat(),
             'text_length': len(contract_text),
-            'extraction_method': 'OCR' if 'OCR' in contract_text else 'Standard',
+            'extraction_method': extraction_method,
             'keyword_analysis': keyword_analysis,
             'llm_analysis': llm_analysis,
             'recommendation': 'ТРЕБУЕТ_ПРОВЕРКИ'  # По умолчанию
@@ -368,7 +339,7 @@ class OCRContractAnalyzer:
         print(f"{'='*60}")
         
         # 1. Извлекаем текст
-        contract_text = self.smart_extract_text(contract_path)
+        contract_text, extraction_method = self.smart_extract(contract_path)
         if not contract_text:
             print("❌ Не удалось извлечь текст из договора")
             return None
@@ -385,7 +356,7 @@ class OCRContractAnalyzer:
             f.write(f"Исходный файл: {os.path.basename(contract_path)}\n")
             f.write(f"Дата извлечения: {datetime.now().isoformat()}\n")
             f.write(f"Размер текста: {len(contract_text)} символов\n")
-            f.write(f"Метод извлечения: {'OCR' if 'Страница' in contract_text else 'Стандартный'}\n")
+            f.write(f"Метод извлечения: {extraction_method}\n")
             f.write(f"{'='*50}\n\n")
             f.write(contract_text)
         
@@ -406,7 +377,7 @@ class OCRContractAnalyzer:
         
         # 3. LLM анализ (если доступен)
         llm_analysis = None
-        if LLAMA_INDEX_AVAILABLE and self.regulations_texts:
+        if (LLAMA_INDEX_AVAILABLE or LLAMA_ANALYSIS_MODE == "direct") and self.regulations_texts:
             try:
                 llm_analysis = self.analyze_with_llama(contract_text)
             except Exception as e:
@@ -415,7 +386,8 @@ class OCRContractAnalyzer:
         
         # 4. Генерируем отчет (с защитой от ошибок)
         try:
-            report = self.generate_report(contract_path, contract_text, keyword_analysis, llm_analysis)
+            report = self.generate_report(contract_path, contract_text, keyword_analysis, llm_analysis,
+                                          extraction_method)
         except Exception as e:
             print(f"⚠️ Ошибка создания отчета: {e}")
             # Создаем минимальный отчет
@@ -423,7 +395,7 @@ class OCRContractAnalyzer:
                 'contract_file': os.path.basename(contract_path),
                 'analysis_date': timestamp,
                 'text_length': len(contract_text),
-                'extraction_method': 'OCR' if 'Страница' in contract_text else 'Стандартный',
+                'extraction_method': extraction_method,
                 'keyword_analysis': keyword_analysis,
                 'llm_analysis': llm_analysis,
                 'recommendation': 'ТРЕБУЕТ_ПРОВЕРКИ',
@@ -436,7 +408,7 @@ class OCRContractAnalyzer:
                 'contract_file': os.path.basename(contract_path),
                 'analysis_date': timestamp,
                 'text_length': len(contract_text),
-                'extraction_method': 'OCR' if 'Страница' in contract_text else 'Стандартный',
+                'extraction_method': extraction_method,
                 'keyword_analysis': keyword_analysis,
                 'llm_analysis': llm_analysis,
                 'recommendation': 'ОШИБКА_АНАЛИЗА',
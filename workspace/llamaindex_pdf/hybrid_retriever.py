@@ -0,0 +1,191 @@
+# hybrid_retriever.py
+import argparse
+import heapq
+import json
+import math
+import re
+import time
+from typing import Any, List
+
+from langchain.schema import BaseRetriever, Document
+
+# Слова с номерами держим целиком: "фз-173", "12.1", "8471.30", "833/2014"
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё]+(?:[-./][0-9a-zа-яё]+)*")
+_PART_RE = re.compile(r"[-./]")
+# Без морфологии: длинные слова сводим к префиксу ("валютного" / "валютной" -> "валютн")
+STEM_LENGTH = 6
+
+
+def tokenize(text):
+    """Термы BM25: слова, составные номера и их части, префиксы длинных слов"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower().replace('ё', 'е')):
+        terms.append(token)
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+        elif len(token) > STEM_LENGTH and token.isalpha():
+            terms.append(token[:STEM_LENGTH])
+    return terms
+
+
+def doc_key(document):
+    """Ключ фрагмента для слияния результатов двух поисков"""
+    return document.metadata.get('source'), document.page_content
+
+
+class BM25Index:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        start_time = time.time()
+
+        self._postings = {}  # терм -> [(номер документа, частота)]
+        self._doc_lengths = []
+        for doc_idx, document in enumerate(documents):
+            terms = tokenize(document.page_content)
+            self._doc_lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((doc_idx, tf))
+
+        total = len(documents)
+        self._avg_length = sum(self._doc_lengths) / total if total else 0.0
+        self._idf = {term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                     for term, postings in self._postings.items()}
+        self.build_time = time.time() - start_time
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """Индекс по тем же фрагментам, что лежат в Chroma"""
+        data = vectorstore.get(include=["documents", "metadatas"])
+        documents = [Document(page_content=text, metadata=metadata or {})
+                     for text, metadata in zip(data['documents'], data['metadatas'])]
+        return cls(documents)
+
+    def search(self, query, k=5):
+        """[(документ, оценка)] по убыванию оценки BM25"""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for doc_idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_idx] / self._avg_length)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.documents[doc_idx], score) for doc_idx, score in best]
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """Слияние ранжированных списков документов (RRF)"""
+    scores = {}
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, 1):
+            key = doc_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    best = sorted(scores, key=lambda key: -scores[key])[:k]
+    return [documents[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    vectorstore: Any
+    bm25: Any
+    k: int = 5
+    fetch_k: int = 20  # кандидатов из каждого поиска до слияния
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def vector_search(self, query):
+        return self.vectorstore.similarity_search(query, k=self.fetch_k)
+
+    def keyword_search(self, query):
+        return [document for document, _ in self.bm25.search(query, k=self.fetch_k)]
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        return reciprocal_rank_fusion([self.vector_search(query), self.keyword_search(query)],
+                                      k=self.k, rrf_k=self.rrf_k)
+
+
+def create_hybrid_retriever(vectorstore, k=5, fetch_k=20):
+    """BM25 по фрагментам из Chroma + векторный поиск, слияние через RRF"""
+    bm25 = BM25Index.from_vectorstore(vectorstore)
+    print(f"🔎 BM25 индекс: {len(bm25.documents)} фрагментов, {len(bm25._postings)} термов "
+          f"({bm25.build_time:.2f} с)")
+    return HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=k, fetch_k=fetch_k)
+
+
+def is_relevant(document, expected):
+    """Фрагмент релевантен, если совпал источник и (если задан) встречается текст"""
+    if expected.get('source') and expected['source'] not in document.metadata.get('source', ''):
+        return False
+    if expected.get('contains') and expected['contains'].lower() not in document.page_content.lower():
+        return False
+    return True
+
+
+def evaluate_recall(retriever, labelled_queries, k=5):
+    """Recall@k и задержка для векторного, BM25 и гибридного поиска
+
+    labelled_queries: [{"query": "...", "relevant": [{"source": "...", "contains": "..."}]}]
+    """
+    modes = {
+        'vector': lambda q: retriever.vector_search(q)[:k],
+        'bm25': lambda q: retriever.keyword_search(q)[:k],
+        'hybrid': lambda q: retriever._get_relevant_documents(q)[:k]
+    }
+    results = {}
+    for mode, search in modes.items():
+        hits = 0
+        total = 0
+        latencies = []
+        for item in labelled_queries:
+            start_time = time.perf_counter()
+            documents = search(item['query'])
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            for expected in item['relevant']:
+                total += 1
+                if any(is_relevant(document, expected) for document in documents):
+                    hits += 1
+        latencies.sort()
+        results[mode] = {
+            'recall': round(hits / total, 3) if total else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else 0.0
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Оценка recall гибридного поиска по регламентам")
+    parser.add_argument("queries", help="JSON с размеченными запросами")
+    parser.add_argument("--k", type=int, default=5, help="Число фрагментов в выдаче")
+    parser.add_argument("--db", default="./chroma_db", help="Папка векторной базы")
+    args = parser.parse_args()
+
+    from langchain.vectorstores import Chroma
+    from embedding_pipeline import BatchedEmbeddings
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        labelled_queries = json.load(f)
+
+    vectorstore = Chroma(persist_directory=args.db, embedding_function=BatchedEmbeddings())
+    retriever = create_hybrid_retriever(vectorstore, k=args.k)
+    results = evaluate_recall(retriever, labelled_queries, k=args.k)
+
+    print(f"\n📊 Recall@{args.k} по {len(labelled_queries)} запросам:")
+    for mode, stats in results.items():
+        print(f"  {mode:7s} recall={stats['recall']:.3f}  среднее={stats['mean_ms']:.1f} мс  p95={stats['p95_ms']:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
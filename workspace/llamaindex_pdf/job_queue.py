@@ -0,0 +1,96 @@
+# job_queue.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, handler, workers=None, max_pending=None, ttl=3600):
+        # Параллельность и размер очереди задаются через окружение контейнера
+        self.handler = handler
+        self.workers = workers or int(os.environ.get("ANALYSIS_WORKERS", "2"))
+        self.max_pending = max_pending if max_pending is not None else int(os.environ.get("ANALYSIS_QUEUE_SIZE", "8"))
+        self.ttl = ttl  # сколько секунд хранить результат завершенной задачи
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        # Выполняющиеся + ожидающие задачи; при исчерпании - отказ (backpressure)
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, *args, **kwargs):
+        """Ставим задачу в очередь, возвращаем job_id (QueueFullError если мест нет)"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"Очередь заполнена: {self.workers} в работе, {self.max_pending} в ожидании")
+
+        self._cleanup()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'created': time.time(),
+                'started': None,
+                'finished': None,
+                'result': None,
+                'error': None
+            }
+
+        try:
+            self._executor.submit(self._run, job_id, args, kwargs)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                del self._jobs[job_id]
+            raise
+        return job_id
+
+    def _run(self, job_id, args, kwargs):
+        """Выполнение задачи в рабочем потоке"""
+        self._update(job_id, status='running', started=time.time())
+        try:
+            result = self.handler(*args, **kwargs)
+            if result is None:
+                self._update(job_id, status='failed', error='Анализ завершился с ошибками')
+            else:
+                self._update(job_id, status='done', result=result)
+        except (Exception, SystemExit) as e:
+            # SystemExit из обработчика не должен оставлять задачу в статусе 'running'
+            print(f"❌ Ошибка задачи {job_id}: {e}")
+            self._update(job_id, status='failed', error=str(e) or type(e).__name__)
+        finally:
+            self._update(job_id, finished=time.time())
+            self._slots.release()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        """Статус и результат задачи (None если не найдена)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        """Количество задач по статусам"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'workers': self.workers, 'max_pending': self.max_pending, 'jobs': counts}
+
+    def _cleanup(self):
+        """Удаляем результаты задач, завершенных раньше чем ttl секунд назад"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['finished'] and job['finished'] < deadline]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,115 @@
+# keyword_scanner.py
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import deque
+
+KEYWORDS_FILE = os.environ.get(
+    "KEYWORDS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.json")
+)
+
+
+class KeywordScanner:
+    def __init__(self, categories):
+        # categories: {категория: [основы слов]}; порядок категорий - их приоритет
+        self.categories = {category: [kw.lower() for kw in keywords]
+                           for category, keywords in categories.items()}
+        self._build()
+
+    def _build(self):
+        """Автомат Ахо-Корасик: бор по всем ключевым словам + суффиксные ссылки"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for category, keywords in self.categories.items():
+            for keyword in keywords:
+                state = 0
+                for char in keyword:
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][char] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append([])
+                    state = next_state
+                self._out[state].append((keyword, category))
+
+        # Обход в ширину: ссылка узла - самый длинный собственный суффикс в боре
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # Совпадения суффикса тоже заканчиваются в этом узле
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def scan(self, text):
+        """Все вхождения за один проход: (начало, конец, ключевое слово, категория)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for pos, original in enumerate(text):
+            for char in original.lower():
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for keyword, category in out[state]:
+                    yield max(0, pos + 1 - len(keyword)), pos + 1, keyword, category
+
+    def find_keywords(self, text):
+        """Найденные ключевые слова по категориям (в порядке словаря, без повторов)"""
+        matched = {(keyword, category) for _, _, keyword, category in self.scan(text)}
+        return {category: [kw for kw in keywords if (kw, category) in matched]
+                for category, keywords in self.categories.items()}
+
+    def classify_lines(self, text, min_length=10):
+        """Строки текста с категорией первого по приоритету совпадения: [(строка, категория)]"""
+        lines = text.split('\n')
+        line_starts = []
+        offset = 0
+        for line in lines:
+            line_starts.append(offset)
+            offset += len(line) + 1
+
+        priority = {category: i for i, category in enumerate(self.categories)}
+        best = {}
+        for start, _, _, category in self.scan(text):
+            line_num = bisect_right(line_starts, start) - 1
+            if line_num not in best or priority[category] < priority[best[line_num]]:
+                best[line_num] = category
+
+        result = []
+        for line_num in sorted(best):
+            line_clean = lines[line_num].strip()
+            if len(line_clean) >= min_length:
+                result.append((line_clean, best[line_num]))
+        return result
+
+
+_keywords = None
+_scanners = {}
+_scanners_lock = threading.Lock()
+
+
+def load_keywords(path=None):
+    """Словарь ключевых слов: {набор: {категория: [основы слов]}}"""
+    with open(path or KEYWORDS_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_scanner(name):
+    """Скомпилированный автомат для набора ключевых слов (один на процесс)"""
+    global _keywords
+    with _scanners_lock:
+        if name not in _scanners:
+            if _keywords is None:
+                _keywords = load_keywords()
+            _scanners[name] = KeywordScanner(_keywords[name])
+        return _scanners[name]
@@ -1,40 +1,35 @@
 # langchain_ollama_analyzer.py
 import os
-import sys
 import argparse
 from datetime import datetime
 import json
+import threading
 import warnings
 from pathlib import Path
 
-# PDF и OCR обработка
-import pymupdf4llm
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
-
-# LangChain компоненты
-from langchain.llms import Ollama
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from langchain.schema import Document
-from langchain.callbacks.manager import CallbackManager
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+# Тяжелые зависимости (LangChain, torch, OCR) импортируются при первом использовании:
+# импорт модуля (например, сервером) не загружает модели и библиотеки
+from contract_mapreduce import prepare_contract_input, MAP_REDUCE_ENABLED
+from prompt_budget import PromptBudget, BudgetedRetrievalQA
 
 # Отключаем предупреждения
 warnings.filterwarnings("ignore")
-Image.MAX_IMAGE_PIXELS = None
+
+# Поиск по регламентам: hybrid (BM25 + эмбеддинги, RRF) или vector (только эмбеддинги)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
 
 class LangChainOllamaAnalyzer:
-    def __init__(self, regulations_path="./regulations", model_name="saiga:7b-instruct"):
+    def __init__(self, regulations_path="./regulations", model_name="saiga:7b-instruct",
+                 map_reduce=MAP_REDUCE_ENABLED):
         self.regulations_path = regulations_path
         self.model_name = model_name
+        self.map_reduce = map_reduce
         self.llm = None
+        self.map_llm = None
         self.embeddings = None
         self.vectorstore = None
+        self.qa_chain = None
+        self._warm_lock = threading.Lock()
         
         print(f"🚀 Инициализация LangChain + Ollama анализатора")
         print(f"🤖 Instruct модель: {model_name}")
@@ -45,12 +40,16 @@ class LangChainOllamaAnalyzer:
     def setup_embeddings(self):
         """Настройка многоязычных эмбеддингов"""
         print("🔧 Настройка многоязычных эмбеддингов...")
+        from langchain.embeddings import HuggingFaceEmbeddings
+        from embedding_pipeline import BatchedEmbeddings
+        
         try:
-            # Русскоязычные эмбеддинги
-            self.embeddings = HuggingFaceEmbeddings(
+            # Русскоязычные эмбеддинги: батчи и потоки настраиваются через
+            # EMBED_BATCH_SIZE / EMBED_THREADS / EMBED_WORKERS
+            self.embeddings = BatchedEmbeddings(
                 model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
+                device='cpu',
+                normalize=True
             )
             print("✅ Многоязычные эмбеддинги настроены")
         except Exception as e:
@@ -66,27 +65,32 @@ class LangChainOllamaAnalyzer:
         print(f"🔧 Настройка Ollama модели: {self.model_name}")
         
         try:
-            # Проверяем доступность Ollama
-            import requests
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
+            # Проверяем доступность Ollama: результат кэшируется общим клиентом
+            from ollama_client import OllamaError, get_ollama_client
+            client = get_ollama_client()
+            health = client.health()
             
-            if response.status_code != 200:
-                print("❌ Ollama не запущен. Запустите: ollama serve")
-                sys.exit(1)
+            if not health['ok']:
+                raise OllamaError(f"Ollama не запущен ({health['error']}). Запустите: ollama serve")
             
             # Проверяем наличие модели
-            models = [m['name'] for m in response.json().get('models', [])]
-            if self.model_name not in models:
+            if not client.has_model(self.model_name):
                 print(f"⚠️ Модель {self.model_name} не найдена")
                 print(f"📥 Загружаем модель...")
                 os.system(f"ollama pull {self.model_name}")
+                client.health(force=True)
+            
+            # Создаем LLM: запросы идут через общий пул соединений
+            from ollama_langchain import PooledOllama
+            from langchain.callbacks.manager import CallbackManager
+            from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
             
-            # Создаем LLM
             callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
             
-            self.llm = Ollama(
+            self.llm = PooledOllama(
                 model=self.model_name,
                 callback_manager=callback_manager,
+                streaming=True,
                 temperature=0.1,
                 num_ctx=4096,
                 num_predict=1024,
@@ -94,136 +98,79 @@ class LangChainOllamaAnalyzer:
                 top_p=0.9,
                 repeat_penalty=1.1
             )
+            # Для разделов договора: без вывода в консоль (запросы идут параллельно)
+            # и с коротким ответом - выписка фактов
+            self.map_llm = PooledOllama(
+                model=self.model_name,
+                temperature=0.1,
+                num_ctx=4096,
+                num_predict=512,
+                top_k=40,
+                top_p=0.9,
+                repeat_penalty=1.1
+            )
             
             print("✅ Ollama LLM настроен")
             
         except Exception as e:
             print(f"❌ Ошибка настройки Ollama: {e}")
             print("💡 Убедитесь что Ollama запущен: ollama serve")
-            sys.exit(1)
+            # Анализатор работает в потоках сервера: ошибку получает задача, процесс не завершаем
+            raise
     
     def extract_text_with_ocr(self, pdf_path):
         """OCR извлечение текста (оптимизированное)"""
-        print(f"🔍 OCR обработка: {os.path.basename(pdf_path)}")
-        
-        try:
-            # Конвертируем с меньшим DPI для скорости
-            images = convert_from_path(pdf_path, dpi=200, thread_count=4)
-            all_text = []
-            
-            for i, image in enumerate(images):
-                print(f"🔤 OCR страница {i+1}/{len(images)}...")
-                
-                # Оптимизированные настройки OCR
-                custom_config = r'--oem 3 --psm 6 -l rus+eng'
-                text = pytesseract.image_to_string(image, config=custom_config)
-                
-                if text.strip():
-                    all_text.append(f"=== Страница {i+1} ===\n{text}")
-                
-                # Освобождаем память
-                del image
-            
-            combined_text = "\n\n".join(all_text)
-            print(f"✅ OCR завершен: {len(combined_text)} символов")
-            return combined_text
-            
-        except Exception as e:
-            print(f"❌ Ошибка OCR: {e}")
-            return None
+        # DPI выбирается адаптивно, страницы распределяются по пулу процессов
+        import ocr_engine
+        return ocr_engine.extract_text_with_ocr(pdf_path)
     
     def smart_extract_text(self, pdf_path):
         """Умное извлечение текста"""
-        try:
-            text = pymupdf4llm.to_markdown(pdf_path)
-            if len(text.strip()) > 100:
-                print(f"✅ Стандартное извлечение: {len(text)} символов")
-                return text
-            else:
-                print("⚠️ Мало текста, используем OCR...")
-        except Exception as e:
-            print(f"⚠️ Ошибка стандартного извлечения: {e}")
-        
-        return self.extract_text_with_ocr(pdf_path)
+        import pdf_extraction
+        return pdf_extraction.smart_extract_text(pdf_path)
     
-    def load_regulations(self):
-        """Загрузка регламентов в векторную базу"""
-        print("📚 Загрузка регламентов...")
-        
-        # Проверяем существующую базу
-        if os.path.exists("./chroma_db"):
-            try:
-                self.vectorstore = Chroma(
-                    persist_directory="./chroma_db",
-                    embedding_function=self.embeddings
-                )
-                print("✅ Загружена существующая векторная база")
+    def smart_extract(self, pdf_path):
+        """Умное извлечение текста: (текст, способ извлечения по метаданным страниц)"""
+        import pdf_extraction
+        text, pages = pdf_extraction.smart_extract(pdf_path)
+        return text, pdf_extraction.extraction_method(pages)
+    
+    def warm_up(self):
+        """Однократная подготовка: векторная база регламентов и цепочка анализа"""
+        with self._warm_lock:
+            if self.qa_chain is not None:
                 return True
-            except Exception as e:
-                print(f"⚠️ Ошибка загрузки существующей базы: {e}")
-                print("🔄 Создаем новую базу...")
-        
-        documents = []
-        processed_path = "./processed_regulations"
-        
-        if os.path.exists(processed_path):
-            txt_files = [f for f in os.listdir(processed_path) if f.endswith('.txt')]
             
-            for file in txt_files:
-                file_path = os.path.join(processed_path, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Очищаем служебную информацию
-                    if "=" * 60 in content:
-                        content = content.split("=" * 60, 1)[-1].strip()
-                    
-                    if len(content.strip()) > 100:  # Только содержательные документы
-                        doc = Document(
-                            page_content=content,
-                            metadata={
-                                "source": file.replace('.txt', ''),
-                                "type": "regulation",
-                                "length": len(content)
-                            }
-                        )
-                        documents.append(doc)
-                        print(f"✅ Загружен: {file} ({len(content)} символов)")
-                    
-                except Exception as e:
-                    print(f"❌ Ошибка загрузки {file}: {e}")
-        
-        if not documents:
-            print("⚠️ Регламенты не найдены")
-            return False
-        
-        # Разбиваем документы на чанки
-        print("🔪 Разбивка документов на фрагменты...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1500,  # Увеличиваем размер чанка
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-        )
-        
-        splits = text_splitter.split_documents(documents)
-        print(f"📝 Создано {len(splits)} фрагментов")
+            if not self.load_regulations():
+                print("⚠️ Продолжаем без регламентов - анализ будет ограниченным")
+            
+            self.qa_chain = self.create_analysis_chain()
+            if not self.qa_chain:
+                print("❌ Не удалось создать цепочку анализа")
+                return False
+            
+            print("🔥 Анализатор готов к обработке договоров")
+            return True
+    
+    def load_regulations(self):
+        """Загрузка регламентов в векторную базу (инкрементально)"""
+        print("📚 Загрузка регламентов...")
         
-        # Создаем векторную базу
-        print("🗄️ Создание векторной базы...")
+        # Эмбеддятся только новые и измененные файлы, фрагменты удаленных
+        # файлов удаляются - см. манифест ./chroma_db/index_manifest.json
         try:
-            self.vectorstore = Chroma.from_documents(
-                documents=splits,
-                embedding=self.embeddings,
-                persist_directory="./chroma_db"
-            )
-            self.vectorstore.persist()
-            print("✅ Векторная база создана и сохранена")
-            return True
+            from regulation_index import RegulationIndexer
+            indexer = RegulationIndexer(self.embeddings, persist_directory="./chroma_db",
+                                        processed_path="./processed_regulations")
+            self.vectorstore = indexer.sync()
         except Exception as e:
             print(f"❌ Ошибка создания векторной базы: {e}")
             return False
+        
+        if not self.vectorstore.get(limit=1, include=[])['ids']:
+            print("⚠️ Регламенты не найдены")
+            return False
+        return True
     
     def create_analysis_chain(self):
         """Создание цепочки анализа с исправленным retriever"""
@@ -268,25 +215,21 @@ class LangChainOllamaAnalyzer:
 ВАЖНО: Отвечай исключительно на русском языке. Будь максимально конкретным и ссылайся на точные пункты нормативных актов.
 """
         
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
-        
         try:
-            # Создаем retriever с базовыми параметрами
-            retriever = self.vectorstore.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 5}  # Только базовые параметры
-            )
+            # Гибридный поиск: точные номера статей и кодов находит BM25, смысл - эмбеддинги
+            if RETRIEVAL_MODE == "hybrid":
+                from hybrid_retriever import create_hybrid_retriever
+                retriever = create_hybrid_retriever(self.vectorstore, k=5)
+            else:
+                retriever = self.vectorstore.as_retriever(
+                    search_type="similarity",
+                    search_kwargs={"k": 5}  # Только базовые параметры
+                )
             
-            qa_chain = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=retriever,
-                chain_type_kwargs={"prompt": prompt},
-                return_source_documents=True
-            )
+            # Промпт собирается под num_ctx: договор и регламенты делят бюджет токенов,
+            # наименее релевантные фрагменты сжимаются и отбрасываются первыми
+            budget = PromptBudget(self.model_name, num_ctx=self.llm.num_ctx, num_predict=self.llm.num_predict)
+            qa_chain = BudgetedRetrievalQA(self.llm, retriever, prompt_template, budget)
             
             print("✅ Цепочка правового анализа создана")
             return qa_chain
@@ -297,6 +240,7 @@ class LangChainOllamaAnalyzer:
             
             # Fallback - создаем более простую цепочку
             try:
+                from langchain.chains import RetrievalQA
                 retriever = self.vectorstore.as_retriever()
                 qa_chain = RetrievalQA.from_chain_type(
                     llm=self.llm,
@@ -319,7 +263,7 @@ class LangChainOllamaAnalyzer:
         print(f"{'='*80}")
         
         # 1. Извлекаем текст договора
-        contract_text = self.smart_extract_text(contract_path)
+        contract_text, extraction_method = self.smart_extract(contract_path)
         if not contract_text:
             print("❌ Не удалось извлечь текст договора")
             return None
@@ -351,27 +295,29 @@ class LangChainOllamaAnalyzer:
             print(f"[Показано 800 из {len(contract_text)} символов]")
         print("-" * 60)
         
-        # 3. Загружаем регламенты в векторную базу
-        if not self.load_regulations():
-            print("⚠️ Продолжаем без регламентов - анализ будет ограниченным")
-        
-        # 4. Создаем цепочку анализа
-        qa_chain = self.create_analysis_chain()
-        if not qa_chain:
-            print("❌ Не удалось создать цепочку анализа")
+        # 3-4. Векторная база и цепочка анализа создаются один раз на процесс
+        if not self.warm_up():
             return None
+        qa_chain = self.qa_chain
         
         # 5. Запускаем LLM анализ
         print("\n🤖 ЗАПУСК ПРАВОВОГО АНАЛИЗА С ИСПОЛЬЗОВАНИЕМ LLM...")
         print("=" * 60)
         
+        map_result = None
+        token_usage = None
         try:
-            # Подготавливаем запрос
-            query = f"""
+            # Длинный договор проверяем целиком: выписки по разделам сворачиваются в сводку
+            contract_input, map_result = prepare_contract_input(
+                contract_text, self.map_llm, enabled=self.map_reduce, fallback_chars=5000
+            )
+            
+            # Подготавливаем запрос ({contract} подставляется в пределах бюджета токенов)
+            query = """
 Проанализируй следующий договор на соответствие российскому и международному законодательству:
 
 ТЕКСТ ДОГОВОРА:
-{contract_text[:5000]}  # Первые 5000 символов
+{contract}
 
 Особое внимание обрати на:
 - Стороны договора и их статус
@@ -382,10 +328,14 @@ class LangChainOllamaAnalyzer:
 """
             
             print("📡 Отправляем запрос к LLM...")
-            result = qa_chain({"query": query})
+            if isinstance(qa_chain, BudgetedRetrievalQA):
+                result = qa_chain({"query": query, "contract": contract_input})
+            else:
+                result = qa_chain({"query": query.format(contract=contract_input)})
             
             llm_response = result["result"]
             source_docs = result.get("source_documents", [])
+            token_usage = result.get("token_usage")
             
             print("\n✅ LLM АНАЛИЗ ЗАВЕРШЕН")
             print("=" * 60)
@@ -408,12 +358,15 @@ class LangChainOllamaAnalyzer:
                 {
                     'source': doc.metadata.get("source", "Unknown"),
                     'type': doc.metadata.get("type", "Unknown"),
+                    'article': doc.metadata.get("article_ids", ""),
                     'content_preview': doc.page_content[:200] + "..."
                 }
                 for doc in source_docs
             ],
             'regulations_used': len(source_docs),
-            'extraction_method': 'OCR' if '=== Страница' in contract_text else 'Standard'
+            'token_usage': token_usage,
+            'map_reduce': {k: v for k, v in map_result.items() if k != 'summary'} if map_result else None,
+            'extraction_method': extraction_method
         }
         
         # 7. Выводим результаты
@@ -448,7 +401,8 @@ class LangChainOllamaAnalyzer:
         if report['source_documents']:
             print(f"\n📋 ОСНОВНЫЕ ИСТОЧНИКИ:")
             for i, doc in enumerate(report['source_documents'][:3], 1):
-                print(f"   {i}. {doc['source']}")
+                article = f" ({doc['article']})" if doc.get('article') else ""
+                print(f"   {i}. {doc['source']}{article}")
         
         print(f"\n📝 ЗАКЛЮЧЕНИЕ ЭКСПЕРТА:")
         print("=" * 40)
@@ -493,6 +447,21 @@ class LangChainOllamaAnalyzer:
             f.write("\n" + "=" * 60 + "\n")
             f.write("Конец отчета\n")
 
+DEFAULT_SERVICE_MODEL = 'qwen2.5:3b-instruct'
+
+_analyzers = {}
+_analyzers_lock = threading.Lock()
+
+def get_analyzer(model_name=DEFAULT_SERVICE_MODEL):
+    """Долгоживущий анализатор процесса: эмбеддинги, LLM и retriever загружаются один раз"""
+    with _analyzers_lock:
+        analyzer = _analyzers.get(model_name)
+        if analyzer is None:
+            analyzer = LangChainOllamaAnalyzer(model_name=model_name)
+            _analyzers[model_name] = analyzer
+    analyzer.warm_up()
+    return analyzer
+
 def mainLangChain(pdf_file):
     # parser = argparse.ArgumentParser(description="LangChain + Ollama правовой анализатор договоров")
     # parser.add_argument("pdf_file", help="PDF файл договора")
@@ -505,10 +474,9 @@ def mainLangChain(pdf_file):
     print(f"📁 Файл: {pdf_file}")
     # print(f"🤖 Модель: {model}")
     
-    analyzer = LangChainOllamaAnalyzer(
-        # regulations_path=args.regulations,
-        model_name='qwen2.5:3b-instruct'
-    )
+    # Анализатор переиспользуется между запросами - на каждый договор
+    # выполняется только извлечение текста, поиск и генерация
+    analyzer = get_analyzer(DEFAULT_SERVICE_MODEL)
     
     result = analyzer.analyze_contract(pdf_file)
     
@@ -522,4 +490,4 @@ def mainLangChain(pdf_file):
 if __name__ == "__main__":
     mainLangChain()
 
-__all__ = ['mainLangChain', 'LangChainOllamaAnalyzer']
\ No newline at end of file
+__all__ = ['mainLangChain', 'LangChainOllamaAnalyzer', 'get_analyzer']
\ No newline at end of file
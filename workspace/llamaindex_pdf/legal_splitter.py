@@ -0,0 +1,195 @@
+# legal_splitter.py
+import re
+
+# Заголовки структурных единиц (с разметкой pymupdf4llm: "## ", "**", "*")
+_MARKUP = r"[#*_\s]*"
+CHAPTER_RE = re.compile(_MARKUP + r"(Глава|ГЛАВА|Раздел|РАЗДЕЛ|Chapter|CHAPTER|Section|SECTION)\s+([0-9IVXLC]+)[*_\s]*(?:[.:—–-]|$)")
+# "Статья 12. Название", "*Article 3b*"; ссылки вида "Article 2(a) of ..." заголовком не считаются
+ARTICLE_RE = re.compile(_MARKUP + r"(Статья|СТАТЬЯ|Article|ARTICLE)\s+(\d+[a-zа-я]?)[*_\s]*(?:[.:—–-]\s*.*)?$")
+# "16. Валютный договор...", "пункт 3." - пункты; "4) ...", "а) ...", "(b) ..." - подпункты
+POINT_RE = re.compile(r"\s*(?:[Пп]ункт\s+)?(\d+(?:\.\d+)*)\.\s+\S")
+SUBPOINT_RE = re.compile(r"\s*(?:[Пп]одпункт\s+)?\(?(\d+|[а-яa-z])\)\s+\S")
+
+DEFAULT_CHUNK_SIZE = 1500
+# Статьи короче этого объединяются со следующими (в пределах главы)
+MIN_CHUNK_SIZE = 400
+# Заголовок, повторяемый в продолжениях статьи (строки таблиц бывают очень длинными)
+MAX_HEADING_LENGTH = 200
+# Границы для текста без пунктов: абзац, строка, предложение, слово
+FALLBACK_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+class LegalTextSplitter:
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, min_chunk_size=MIN_CHUNK_SIZE, fallback_overlap=150):
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.fallback_overlap = fallback_overlap
+
+    def sections(self, text):
+        """Статьи и главы документа: [{'chapter', 'article_id', 'heading', 'lines'}]"""
+        sections = []
+        chapter = ""
+        current = {'chapter': chapter, 'article_id': "", 'heading': "", 'lines': []}
+        for line in text.split('\n'):
+            chapter_match = CHAPTER_RE.match(line)
+            article_match = ARTICLE_RE.match(line)
+            if chapter_match or article_match:
+                if any(l.strip() for l in current['lines']):
+                    sections.append(current)
+                if chapter_match:
+                    chapter = f"{chapter_match.group(1).capitalize()} {chapter_match.group(2)}"
+                    article_id = ""
+                else:
+                    article_id = f"{article_match.group(1).capitalize()} {article_match.group(2)}"
+                current = {'chapter': chapter, 'article_id': article_id,
+                           'heading': line.strip(' #*_\xa0')[:MAX_HEADING_LENGTH], 'lines': []}
+            current['lines'].append(line)
+        if any(l.strip() for l in current['lines']):
+            sections.append(current)
+        return sections
+
+    def split_units(self, lines, pattern):
+        """Делим строки на единицы по границам pattern: [(номер единицы, текст)]"""
+        units = []
+        current_id, current = "", []
+        for line in lines:
+            match = pattern.match(line)
+            if match and current:
+                units.append((current_id, '\n'.join(current)))
+                current = []
+            if match:
+                current_id = match.group(1)
+            current.append(line)
+        if current:
+            units.append((current_id, '\n'.join(current)))
+        return units
+
+    def pack(self, units, budget):
+        """Склеиваем соседние единицы в фрагменты не длиннее budget: [(первая, последняя, текст)]"""
+        chunks = []
+        first, last, parts, length = None, None, [], 0
+        for unit_id, text in units:
+            if parts and length + len(text) + 1 > budget:
+                chunks.append((first, last, '\n'.join(parts)))
+                first, parts, length = None, [], 0
+            if first is None:
+                first = unit_id
+            last = unit_id
+            parts.append(text)
+            length += len(text) + 1
+        if parts:
+            chunks.append((first, last, '\n'.join(parts)))
+        return chunks
+
+    def split_pieces(self, text, budget, separators=FALLBACK_SEPARATORS):
+        """Текст -> части не длиннее budget по самой крупной подходящей границе (склейка дает исходный текст)"""
+        if len(text) <= budget:
+            return [text]
+        for level, separator in enumerate(separators):
+            if separator not in text:
+                continue
+            parts = text.split(separator)
+            pieces = []
+            for i, part in enumerate(parts):
+                part = part + separator if i < len(parts) - 1 else part
+                if part:
+                    pieces.extend(self.split_pieces(part, budget, separators[level + 1:]))
+            return pieces
+        return [text[i:i + budget] for i in range(0, len(text), budget)]
+
+    def fallback_split(self, text, budget):
+        """Текст без внутренней структуры длиннее фрагмента - разбиение с перекрытием
+
+        Без LangChain: длинный текст без пунктов типичен для договоров после OCR.
+        """
+        chunks = []
+        current, length = [], 0
+        for piece in self.split_pieces(text, budget):
+            if current and length + len(piece) > budget:
+                chunks.append("".join(current).strip())
+                # Перекрытие: конец предыдущего фрагмента, если рядом с новой частью помещается
+                while current and (length > self.fallback_overlap or length + len(piece) > budget):
+                    length -= len(current.pop(0))
+            current.append(piece)
+            length += len(piece)
+        if current:
+            chunks.append("".join(current).strip())
+        return [chunk for chunk in chunks if chunk]
+
+    def split_section(self, section):
+        """Статья -> фрагменты по пунктам и подпунктам: [(пункты, текст)]"""
+        text = '\n'.join(section['lines']).strip()
+        if len(text) <= self.chunk_size:
+            return [("", text)]
+
+        # Продолжения статьи получат ее заголовок - оставляем под него место
+        budget = self.chunk_size - len(section['heading']) - 1
+        atoms = []
+        for point_id, unit in self.split_units(section['lines'], POINT_RE):
+            if len(unit) <= budget:
+                atoms.append((point_id, unit))
+                continue
+            # Пункт длиннее фрагмента - делим по подпунктам, затем посимвольно
+            for _, _, sub_chunk in self.pack(self.split_units(unit.split('\n'), SUBPOINT_RE), budget):
+                if len(sub_chunk) <= budget:
+                    atoms.append((point_id, sub_chunk))
+                else:
+                    atoms.extend((point_id, part) for part in self.fallback_split(sub_chunk, budget))
+
+        pieces = []
+        for first, last, chunk in self.pack(atoms, budget):
+            pieces.append((first if first == last else f"{first}-{last}", chunk))
+        return pieces
+
+    def split_text_with_metadata(self, text):
+        """Фрагменты текста с метаданными структуры: [(текст, метаданные)]"""
+        results = []
+        pending = None  # короткие статьи копятся и объединяются со следующими
+        for section in self.sections(text):
+            for index, (points, chunk) in enumerate(self.split_section(section)):
+                chunk = chunk.strip()
+                if not chunk:
+                    continue
+                # Продолжению длинной статьи возвращаем ее заголовок - для поиска и для модели
+                if index > 0 and section['heading']:
+                    chunk = f"{section['heading']}\n{chunk}"
+                metadata = {
+                    'chapter': section['chapter'],
+                    'article_id': section['article_id'],
+                    'article_ids': section['article_id'],
+                    'points': points
+                }
+
+                if pending is not None:
+                    combined = len(pending[0]) + len(chunk) + 2
+                    if pending[1]['chapter'] == metadata['chapter'] and combined <= self.chunk_size:
+                        ids = [i for i in (pending[1]['article_ids'], metadata['article_ids']) if i]
+                        pending = (f"{pending[0]}\n\n{chunk}",
+                                   dict(pending[1], article_ids=', '.join(ids), points=""))
+                        if len(pending[0]) >= self.min_chunk_size:
+                            results.append(pending)
+                            pending = None
+                        continue
+                    results.append(pending)
+                    pending = None
+
+                if len(chunk) < self.min_chunk_size:
+                    pending = (chunk, metadata)
+                else:
+                    results.append((chunk, metadata))
+        if pending is not None:
+            results.append(pending)
+        return results
+
+    def split_text(self, text):
+        return [chunk for chunk, _ in self.split_text_with_metadata(text)]
+
+    def split_documents(self, documents):
+        """Как у TextSplitter LangChain, но с article_id / chapter / points в метаданных"""
+        from langchain.schema import Document
+
+        splits = []
+        for document in documents:
+            for chunk, metadata in self.split_text_with_metadata(document.page_content):
+                splits.append(Document(page_content=chunk, metadata=dict(document.metadata, **metadata)))
+        return splits
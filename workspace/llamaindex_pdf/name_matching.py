@@ -0,0 +1,145 @@
+# name_matching.py
+
+# Упрощенная транслитерация (паспортная, ICAO) - так названия российских
+# лиц чаще всего записаны в латинских списках OFAC/EU/UK
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'iu', 'я': 'ia',
+    # казахские буквы встречаются в названиях контрагентов
+    'ә': 'a', 'ғ': 'g', 'қ': 'k', 'ң': 'n', 'ө': 'o', 'ұ': 'u', 'ү': 'u', 'һ': 'h', 'і': 'i'
+}
+_TRANSLIT_TABLE = str.maketrans(_TRANSLIT)
+
+# Латинские варианты одного и того же звука сводим к одному написанию
+_LATIN_FOLDS = (('shch', 'sch'), ('yu', 'iu'), ('ya', 'ia'), ('iy', 'i'), ('yi', 'i'), ('ij', 'i'), ('j', 'i'))
+
+
+def transliterate(text):
+    """Кириллица -> латиница; латинский текст приводится к тем же правилам"""
+    text = text.translate(_TRANSLIT_TABLE)
+    for source, target in _LATIN_FOLDS:
+        text = text.replace(source, target)
+    return text
+
+
+def has_cyrillic(text):
+    return any('а' <= char <= 'я' or char == 'ё' for char in text)
+
+
+def trigrams(text):
+    """Символьные триграммы с границами слова"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def levenshtein_bounded(a, b, max_dist):
+    """Расстояние Левенштейна или max_dist + 1, если оно больше max_dist"""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(a) + 1))
+    for j, char_b in enumerate(b, 1):
+        current = [j] + [0] * len(a)
+        # Считаем только полосу шириной 2*max_dist вокруг диагонали
+        low = max(1, j - max_dist)
+        high = min(len(a), j + max_dist)
+        if low > 1:
+            current[low - 1] = max_dist + 1
+        for i in range(low, high + 1):
+            cost = 0 if a[i - 1] == char_b else 1
+            current[i] = min(previous[i] + 1, current[i - 1] + 1, previous[i - 1] + cost)
+        if high < len(a):
+            current[high + 1:] = [max_dist + 1] * (len(a) - high)
+        if min(current[low - 1:high + 1]) > max_dist:
+            return max_dist + 1
+        previous = current
+    return min(previous[len(a)], max_dist + 1)
+
+
+def jaro_winkler(a, b, prefix_scale=0.1):
+    """Сходство Джаро-Винклера (0..1)"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+
+    window = max(len(a), len(b)) // 2 - 1
+    matched_b = [False] * len(b)
+    matches_a = []
+    for i, char in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not matched_b[j] and b[j] == char:
+                matched_b[j] = True
+                matches_a.append(char)
+                break
+    if not matches_a:
+        return 0.0
+
+    matches_b = [b[j] for j in range(len(b)) if matched_b[j]]
+    transpositions = sum(x != y for x, y in zip(matches_a, matches_b)) / 2
+    m = len(matches_a)
+    jaro = (m / len(a) + m / len(b) + (m - transpositions) / m) / 3
+
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+
+def token_jaro_winkler(a, b, min_token_score):
+    """Джаро-Винклер по словам: каждому слову короткого названия - свое слово длинного
+
+    0, если у какого-то слова нет пары со сходством не ниже min_token_score.
+    Слова длинного названия без пары снижают оценку.
+    """
+    a_tokens, b_tokens = a.split(), b.split()
+    if len(a_tokens) > len(b_tokens):
+        a_tokens, b_tokens = b_tokens, a_tokens
+    if not a_tokens:
+        return 0.0
+
+    unused = list(b_tokens)
+    weighted = 0.0
+    # Длинные (отличительные) слова подбираем первыми
+    for token in sorted(a_tokens, key=len, reverse=True):
+        score, best = max((jaro_winkler(token, candidate), candidate) for candidate in unused)
+        if score < min_token_score:
+            return 0.0
+        unused.remove(best)
+        weighted += score * (len(token) + len(best))
+    return weighted / (sum(map(len, a_tokens)) + sum(map(len, b_tokens)))
+
+
+def edit_similarity(a, b, min_score):
+    """Нормированный Левенштейн (0, если ниже min_score)"""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 0.0
+    max_dist = int((1 - min_score) * longest)
+    distance = levenshtein_bounded(a, b, max_dist)
+    return 1 - distance / longest if distance <= max_dist else 0.0
+
+
+def similarity(a, b, min_score):
+    """Сходство названий: нормированный Левенштейн (и без пробелов), ниже порога - Джаро-Винклер по словам"""
+    edit_score = edit_similarity(a, b, min_score)
+    if edit_score >= min_score:
+        return edit_score
+    # "GAZ PROM BANK" и "GAZPROMBANK": слитное и раздельное написание
+    compact_a, compact_b = a.replace(' ', ''), b.replace(' ', '')
+    if (compact_a, compact_b) != (a, b):
+        edit_score = max(edit_score, edit_similarity(compact_a, compact_b, min_score))
+        if edit_score >= min_score:
+            return edit_score
+
+    # Джаро-Винклер прощает опечатки и сокращения в словах. По всей строке он дает
+    # высокое сходство разным названиям с общим словом ("SAMSUNG ELECTRONICS" и
+    # "HONG KONG ELECTRONICS"), поэтому сравниваем слова попарно
+    return max(edit_score, token_jaro_winkler(a, b, min_score))
@@ -1,67 +1,19 @@
 # ocr_analyzer.py
-import pymupdf4llm
-import pymupdf
-import pytesseract
-from pdf2image import convert_from_path
 import sys
 import os
 from datetime import datetime
-from PIL import Image
-import tempfile
+import ocr_engine
+import pdf_extraction
+from keyword_scanner import get_scanner
 
 def extract_text_with_ocr(pdf_path):
     """Извлекаем текст с помощью OCR для отсканированных документов"""
-    print(f"🔍 OCR обработка файла: {os.path.basename(pdf_path)}")
-    
-    try:
-        # Конвертируем PDF в изображения
-        print("📷 Конвертация PDF в изображения...")
-        images = convert_from_path(pdf_path, dpi=300)  # Высокое разрешение для лучшего OCR
-        
-        all_text = []
-        
-        for i, image in enumerate(images):
-            print(f"🔤 OCR обработка страницы {i+1}/{len(images)}...")
-            
-            # Настройки для русского и английского языков
-            custom_config = r'--oem 3 --psm 6 -l rus+eng'
-            
-            # Извлекаем текст
-            text = pytesseract.image_to_string(image, config=custom_config)
-            
-            if text.strip():
-                all_text.append(f"=== Страница {i+1} ===\n{text}")
-                print(f"✅ Страница {i+1}: извлечено {len(text)} символов")
-            else:
-                print(f"⚠️ Страница {i+1}: текст не найден")
-        
-        combined_text = "\n\n".join(all_text)
-        print(f"✅ OCR завершен. Всего извлечено: {len(combined_text)} символов")
-        
-        return combined_text
-        
-    except Exception as e:
-        print(f"❌ Ошибка OCR: {e}")
-        return None
+    # Страницы распределяются по пулу процессов общего OCR движка
+    return ocr_engine.extract_text_with_ocr(pdf_path)  # DPI выбирается адаптивно по уверенности OCR
 
 def smart_extract_text(pdf_path):
-    """Умное извлечение текста - сначала пробуем обычный способ, потом OCR"""
-    print(f"📄 Извлечение текста из: {os.path.basename(pdf_path)}")
-    
-    # Сначала пробуем обычное извлечение
-    try:
-        text = pymupdf4llm.to_markdown(pdf_path)
-        if len(text.strip()) > 100:  # Если извлекли достаточно текста
-            print(f"✅ Обычное извлечение: {len(text)} символов")
-            return text
-        else:
-            print("⚠️ Мало текста при обычном извлечении, пробуем OCR...")
-    except Exception as e:
-        print(f"⚠️ Ошибка обычного извлечения: {e}")
-        print("🔄 Переходим к OCR...")
-    
-    # Если обычное не сработало, используем OCR
-    return extract_text_with_ocr(pdf_path)
+    """Умное извлечение текста - текстовый слой где он есть, OCR для сканов"""
+    return pdf_extraction.smart_extract_text(pdf_path)
 
 def analyze_contract_with_ocr(pdf_path, regulations_path="./regulations"):
     """Анализ договора с поддержкой OCR"""
@@ -94,15 +46,10 @@ def analyze_contract_with_ocr(pdf_path, regulations_path="./regulations"):
     # Простой анализ на основе ключевых слов
     print(f"\n🔍 БЫСТРЫЙ АНАЛИЗ:")
     
-    keywords_sanctions = ['санкци', 'запрет', 'ограничен', 'блокир']
-    keywords_currency = ['валют', 'доллар', 'евро', 'рубл', 'курс']
-    keywords_contract = ['договор', 'контракт', 'соглашен', 'сторон']
-    
-    text_lower = contract_text.lower()
-    
-    found_sanctions = [kw for kw in keywords_sanctions if kw in text_lower]
-    found_currency = [kw for kw in keywords_currency if kw in text_lower]
-    found_contract = [kw for kw in keywords_contract if kw in text_lower]
+    found = get_scanner("quick_scan").find_keywords(contract_text)
+    found_sanctions = found['sanctions']
+    found_currency = found['currency']
+    found_contract = found['contract']
     
     print(f"📋 Найденные ключевые слова:")
     print(f"  Санкции: {found_sanctions}")
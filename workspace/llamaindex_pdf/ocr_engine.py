@@ -0,0 +1,335 @@
+# ocr_engine.py
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+import pytesseract
+from PIL import Image
+
+try:
+    # C API tesseract: модель загружается один раз на процесс
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# Настройки для русского и английского языков
+DEFAULT_OCR_LANG = 'rus+eng'
+DEFAULT_OCR_CONFIG = rf'--oem 3 --psm 6 -l {DEFAULT_OCR_LANG}'
+# DPI по умолчанию для всех анализаторов: число или "auto" (адаптивный выбор)
+DEFAULT_DPI = os.environ.get("OCR_DPI", "auto")
+DEFAULT_PAGE_TIMEOUT = 120  # секунд на одну страницу
+# Бэкенд OCR: tesserocr (постоянный экземпляр tesseract в каждом процессе),
+# pytesseract (новый процесс tesseract на каждую страницу) или auto
+DEFAULT_BACKEND = os.environ.get("OCR_BACKEND", "auto")
+# Защита от гигантских страниц (аналог Image.MAX_IMAGE_PIXELS): ~A3 при 300 DPI
+MAX_PAGE_PIXELS = 20_000_000
+
+# Адаптивный режим: быстрый проход на низком DPI, повтор на высоком
+# только для страниц с низкой уверенностью tesseract
+ADAPTIVE_LOW_DPI = int(os.environ.get("OCR_LOW_DPI", "150"))
+ADAPTIVE_HIGH_DPI = int(os.environ.get("OCR_HIGH_DPI", "300"))
+ADAPTIVE_MIN_CONFIDENCE = float(os.environ.get("OCR_MIN_CONFIDENCE", "75"))
+
+
+def iter_page_images(pdf_path, dpi=300, max_pixels=MAX_PAGE_PIXELS, page_numbers=None):
+    """Растеризуем PDF постранично - в памяти одновременно только одна страница"""
+    doc = pymupdf.open(pdf_path)
+    try:
+        if page_numbers is None:
+            page_numbers = range(len(doc))
+        for page_num in page_numbers:
+            page = doc[page_num]
+
+            # Если страница слишком большая для выбранного DPI - уменьшаем его
+            page_dpi = dpi
+            width_in, height_in = page.rect.width / 72, page.rect.height / 72
+            pixels = width_in * height_in * page_dpi * page_dpi
+            if pixels > max_pixels:
+                page_dpi = int(dpi * (max_pixels / pixels) ** 0.5)
+                print(f"⚠️ Страница {page_num+1}: слишком большая, DPI снижен до {page_dpi}")
+
+            # Tesseract работает с оттенками серого - это в 3 раза меньше памяти чем RGB
+            pix = page.get_pixmap(dpi=page_dpi, colorspace=pymupdf.csGRAY)
+            image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+            image.info['dpi'] = (page_dpi, page_dpi)
+            del pix
+
+            yield page_num, image
+    finally:
+        doc.close()
+
+
+def _init_worker():
+    """Инициализация рабочего процесса OCR"""
+    # Каждый процесс обрабатывает одну страницу - запрещаем tesseract
+    # запускать собственные потоки, иначе ядра будут переподписаны
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def resolve_backend(backend=DEFAULT_BACKEND):
+    """Выбираем бэкенд OCR с учетом установленных библиотек"""
+    if backend == "auto":
+        return "tesserocr" if TESSEROCR_AVAILABLE else "pytesseract"
+    if backend == "tesserocr" and not TESSEROCR_AVAILABLE:
+        print("⚠️ tesserocr не установлен, используем pytesseract")
+        return "pytesseract"
+    return backend
+
+
+# Экземпляры tesseract текущего потока, ключ - (язык, psm, oem). PyTessBaseAPI
+# не потокобезопасен, а при workers <= 1 OCR идет в потоках анализов (очередь задач)
+_tess_local = threading.local()
+
+
+def _get_tess_api(config):
+    """Постоянный экземпляр tesseract для конфигурации (создается один раз на поток)"""
+    lang = re.search(r'-l\s+(\S+)', config)
+    psm = re.search(r'--psm\s+(\d+)', config)
+    oem = re.search(r'--oem\s+(\d+)', config)
+    key = (lang.group(1) if lang else DEFAULT_OCR_LANG,
+           int(psm.group(1)) if psm else 3,
+           int(oem.group(1)) if oem else 3)
+
+    apis = getattr(_tess_local, 'apis', None)
+    if apis is None:
+        apis = _tess_local.apis = {}
+    api = apis.get(key)
+    if api is None:
+        kwargs = {'lang': key[0], 'psm': key[1], 'oem': key[2]}
+        if os.environ.get("TESSDATA_PREFIX"):
+            kwargs['path'] = os.environ["TESSDATA_PREFIX"]
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        apis[key] = api
+    return api
+
+
+def _tesserocr_recognize(image, config, timeout):
+    """Распознавание страницы постоянным экземпляром tesseract"""
+    api = _get_tess_api(config)
+    api.SetImage(image)
+    if image.info.get('dpi'):
+        api.SetSourceResolution(int(image.info['dpi'][0]))
+    if not api.Recognize(timeout * 1000):
+        raise RuntimeError("Tesseract process timeout")
+    return api
+
+
+def _page_result(page_num, image, text="", confidence=None, error=None):
+    return page_num, {
+        'text': text,
+        'dpi': image.info.get('dpi', (None,))[0],
+        'confidence': confidence,
+        'error': error
+    }
+
+
+def _ocr_page(page_num, image, config, timeout, backend="pytesseract"):
+    """OCR одной страницы (выполняется в рабочем процессе)"""
+    try:
+        if backend == "tesserocr":
+            text = _tesserocr_recognize(image, config, timeout).GetUTF8Text()
+        else:
+            text = pytesseract.image_to_string(image, config=config, timeout=timeout)
+        return _page_result(page_num, image, text)
+    except RuntimeError as e:
+        # pytesseract завершает tesseract по таймауту и бросает RuntimeError
+        return _page_result(page_num, image, error=str(e))
+
+
+def _ocr_page_with_confidence(page_num, image, config, timeout, backend="pytesseract"):
+    """OCR страницы через image_to_data: текст и средняя уверенность по словам"""
+    if backend == "tesserocr":
+        try:
+            api = _tesserocr_recognize(image, config, timeout)
+        except RuntimeError as e:
+            return _page_result(page_num, image, error=str(e))
+        text = api.GetUTF8Text()
+        confidence = float(api.MeanTextConf()) if text.strip() else None
+        return _page_result(page_num, image, text, confidence)
+
+    try:
+        data = pytesseract.image_to_data(image, config=config, timeout=timeout,
+                                         output_type=pytesseract.Output.DICT)
+    except RuntimeError as e:
+        return _page_result(page_num, image, error=str(e))
+
+    lines = []
+    current_line = None
+    weighted_conf = 0.0
+    total_chars = 0
+    for i, word in enumerate(data['text']):
+        conf = float(data['conf'][i])
+        if conf < 0 or not word.strip():
+            continue
+
+        line_id = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if line_id != current_line:
+            # Новый блок отделяем пустой строкой, как image_to_string
+            if current_line is not None and line_id[0] != current_line[0]:
+                lines.append("")
+            lines.append(word)
+            current_line = line_id
+        else:
+            lines[-1] += " " + word
+
+        # Уверенность взвешиваем по длине слова - короткий мусор меньше влияет
+        weighted_conf += conf * len(word)
+        total_chars += len(word)
+
+    confidence = weighted_conf / total_chars if total_chars else None
+    text = "\n".join(lines) + "\n" if lines else ""
+    return _page_result(page_num, image, text, confidence)
+
+
+class OCREngine:
+    def __init__(self, workers=None, dpi=DEFAULT_DPI, config=DEFAULT_OCR_CONFIG,
+                 page_timeout=None, backend=DEFAULT_BACKEND):
+        # Количество процессов и таймаут можно задать через окружение контейнера
+        self.workers = workers or int(os.environ.get("OCR_WORKERS", "0")) or os.cpu_count() or 1
+        self.dpi = dpi
+        self.config = config
+        self.page_timeout = page_timeout or int(os.environ.get("OCR_PAGE_TIMEOUT", DEFAULT_PAGE_TIMEOUT))
+        self.backend = resolve_backend(backend)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        """Пул процессов создается один раз и переиспользуется"""
+        # Анализы из очереди задач идут в нескольких потоках - второй пул не создаем
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_init_worker
+                    )
+        return self._executor
+
+    def ocr_pages(self, pages, task=_ocr_page):
+        """OCR потока страниц (page_num, image) с сохранением порядка страниц
+
+        Страницы забираются из генератора по мере освобождения процессов:
+        в работе одновременно не больше 2 * workers изображений.
+        """
+        if self.workers <= 1:
+            for page_num, image in pages:
+                yield task(page_num, image, self.config, self.page_timeout, self.backend)
+                del image
+            return
+
+        executor = self._get_executor()
+        in_flight = deque()
+        for page_num, image in pages:
+            in_flight.append(executor.submit(task, page_num, image, self.config,
+                                             self.page_timeout, self.backend))
+            del image
+            # Ожидаем в порядке отправки - порядок страниц сохраняется
+            while len(in_flight) >= self.workers * 2:
+                yield in_flight.popleft().result()
+
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def _collect(self, pages, task=_ocr_page):
+        results = {}
+        for page_num, result in self.ocr_pages(pages, task):
+            if result['error']:
+                print(f"⚠️ Страница {page_num+1}: {result['error']}")
+            results[page_num] = result
+        return results
+
+    def ocr_pdf_adaptive(self, pdf_path, page_numbers=None):
+        """Адаптивный OCR: низкий DPI для всех страниц, высокий - только где нужно"""
+        print(f"📷 Быстрый проход OCR на {ADAPTIVE_LOW_DPI} DPI...")
+        pages = iter_page_images(pdf_path, dpi=ADAPTIVE_LOW_DPI, page_numbers=page_numbers)
+        results = self._collect(pages, _ocr_page_with_confidence)
+
+        # Страницы без распознанных слов тоже пересматриваем - мелкий шрифт
+        retry = [page_num for page_num, result in results.items()
+                 if not result['error']
+                 and (result['confidence'] is None or result['confidence'] < ADAPTIVE_MIN_CONFIDENCE)]
+
+        if retry:
+            print(f"🔁 Повтор на {ADAPTIVE_HIGH_DPI} DPI для страниц: {[p + 1 for p in retry]}")
+            pages = iter_page_images(pdf_path, dpi=ADAPTIVE_HIGH_DPI, page_numbers=retry)
+            for page_num, result in self._collect(pages, _ocr_page_with_confidence).items():
+                low = results[page_num]
+                # Оставляем лучший из двух проходов
+                if result['text'].strip() and (low['confidence'] is None
+                                               or (result['confidence'] or 0) >= low['confidence']):
+                    results[page_num] = result
+
+        for page_num in sorted(results):
+            result = results[page_num]
+            conf = f"{result['confidence']:.0f}" if result['confidence'] is not None else "-"
+            print(f"  📐 Страница {page_num+1}: {result['dpi']} DPI, уверенность {conf}")
+        return results
+
+    def ocr_pdf(self, pdf_path, page_numbers=None, dpi=None):
+        """OCR выбранных (по умолчанию всех) страниц PDF
+
+        Возвращает {номер страницы: {'text', 'dpi', 'confidence', 'error'}}.
+        """
+        dpi = dpi or self.dpi
+        if dpi == "auto":
+            return self.ocr_pdf_adaptive(pdf_path, page_numbers)
+        pages = iter_page_images(pdf_path, dpi=int(dpi), page_numbers=page_numbers)
+        return self._collect(pages)
+
+    def ocr_pdf_pages(self, pdf_path, page_numbers=None, dpi=None):
+        """OCR выбранных (по умолчанию всех) страниц PDF: {номер страницы: текст}"""
+        results = self.ocr_pdf(pdf_path, page_numbers, dpi)
+        return {page_num: result['text'] for page_num, result in results.items()}
+
+    def extract_text(self, pdf_path, dpi=None):
+        """Извлекаем текст из PDF, распределяя страницы по процессам"""
+        print(f"🔍 OCR обработка файла: {os.path.basename(pdf_path)}")
+        print(f"📷 Постраничная растеризация PDF (процессов OCR: {self.workers}, бэкенд: {self.backend})...")
+        results = self.ocr_pdf(pdf_path, dpi=dpi)
+
+        all_text = []
+        for page_num in sorted(results):
+            text = results[page_num]['text']
+            if text.strip():
+                all_text.append(f"=== Страница {page_num+1} ===\n{text}")
+                print(f"✅ Страница {page_num+1}: извлечено {len(text)} символов")
+            else:
+                print(f"⚠️ Страница {page_num+1}: текст не найден")
+
+        combined_text = "\n\n".join(all_text)
+        print(f"✅ OCR завершен. Всего извлечено: {len(combined_text)} символов")
+        return combined_text
+
+    def shutdown(self):
+        """Останавливаем пул процессов"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine():
+    """Общий OCR движок процесса (пул создается при первом использовании)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = OCREngine()
+    return _engine
+
+
+def extract_text_with_ocr(pdf_path, dpi=None):
+    """OCR извлечение текста через общий движок"""
+    try:
+        return get_ocr_engine().extract_text(pdf_path, dpi=dpi)
+    except Exception as e:
+        print(f"❌ Ошибка OCR: {e}")
+        return None
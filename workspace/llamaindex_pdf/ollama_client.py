@@ -0,0 +1,156 @@
+# ollama_client.py
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434").rstrip('/')
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "180"))
+# Результат проверки /api/tags переиспользуется это число секунд
+HEALTH_TTL = float(os.environ.get("OLLAMA_HEALTH_TTL", "30"))
+# Неудачную проверку повторяем раньше: сервер мог уже подняться
+HEALTH_FAILURE_TTL = 5.0
+# Соединений в пуле: не меньше параллельных запросов (очередь анализов + map-reduce)
+POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "8"))
+# Сколько Ollama держит модель в памяти после запроса
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaClient:
+    def __init__(self, base_url=OLLAMA_URL, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 health_ttl=HEALTH_TTL, pool_size=POOL_SIZE):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.health_ttl = health_ttl
+        self.pool_size = pool_size
+
+        # Одна сессия на процесс: keep-alive соединения переиспользуются между запросами
+        self.session = requests.Session()
+        # Повторяем только установку соединения: генерацию повторно не отправляем
+        retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._health = None
+        self._health_time = 0.0
+        self._health_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'health_checks': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def health(self, force=False):
+        """Доступность Ollama и список моделей (кэшируется на health_ttl секунд)"""
+        with self._health_lock:
+            now = time.monotonic()
+            if self._health is not None and not force:
+                ttl = self.health_ttl if self._health['ok'] else min(self.health_ttl, HEALTH_FAILURE_TTL)
+                if now - self._health_time < ttl:
+                    return self._health
+
+            self._count('health_checks')
+            try:
+                response = self.session.get(f"{self.base_url}/api/tags",
+                                            timeout=(self.timeout[0], 5))
+                response.raise_for_status()
+                models = [m['name'] for m in response.json().get('models', [])]
+                health = {'ok': True, 'models': models, 'error': None}
+            except (requests.RequestException, ValueError) as e:
+                health = {'ok': False, 'models': [], 'error': str(e)}
+            health['checked'] = time.time()
+
+            self._health = health
+            self._health_time = now
+            return health
+
+    def invalidate_health(self):
+        with self._health_lock:
+            self._health = None
+
+    def has_model(self, model):
+        """Модель загружена в Ollama ("name" без тега означает "name:latest")"""
+        models = self.health()['models']
+        return model in models or (':' not in model and f"{model}:latest" in models)
+
+    def _post(self, path, payload, stream=False):
+        self._count('requests')
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                         timeout=self.timeout, stream=stream)
+        except requests.ConnectionError:
+            # Сервер недоступен - следующая проверка здоровья не должна брать кэш
+            self._count('errors')
+            self.invalidate_health()
+            raise
+        if response.status_code != 200:
+            self._count('errors')
+            raise OllamaError(f"Ollama {response.status_code}: {response.text[:200]}")
+        return response
+
+    def _payload(self, model, prompt, options, system, stream):
+        payload = {'model': model, 'prompt': prompt, 'stream': stream,
+                   'options': options or {}, 'keep_alive': KEEP_ALIVE}
+        if system:
+            payload['system'] = system
+        return payload
+
+    def generate(self, model, prompt, options=None, system=None):
+        """Ответ /api/generate целиком (текст и счетчики токенов/времени)"""
+        return self._post("/api/generate", self._payload(model, prompt, options, system, False)).json()
+
+    def complete(self, model, prompt, options=None, system=None):
+        return self.generate(model, prompt, options, system).get('response', '')
+
+    def stream_generate(self, model, prompt, options=None, system=None):
+        """Токены ответа по мере генерации"""
+        response = self._post("/api/generate", self._payload(model, prompt, options, system, True), stream=True)
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise OllamaError(chunk['error'])
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    break
+
+    def status(self):
+        """Состояние клиента для мониторинга"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            'base_url': self.base_url,
+            'health': self.health(),
+            'connect_timeout': self.timeout[0],
+            'read_timeout': self.timeout[1],
+            'health_ttl': self.health_ttl,
+            'pool_size': self.pool_size,
+            **stats
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ollama_client():
+    """Общий клиент Ollama процесса"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
@@ -0,0 +1,51 @@
+# ollama_langchain.py
+from typing import Any, List, Optional
+
+from langchain.llms.base import LLM
+
+from ollama_client import get_ollama_client
+
+
+class PooledOllama(LLM):
+    model: str
+    temperature: float = 0.1
+    num_ctx: int = 4096
+    num_predict: int = 1024
+    top_k: int = 40
+    top_p: float = 0.9
+    repeat_penalty: float = 1.1
+    system: Optional[str] = None
+    streaming: bool = False  # токены уходят в callbacks по мере генерации
+
+    @property
+    def _llm_type(self) -> str:
+        return "ollama-pooled"
+
+    @property
+    def _identifying_params(self):
+        return {'model': self.model, **self.ollama_options()}
+
+    def ollama_options(self):
+        return {
+            'temperature': self.temperature,
+            'num_ctx': self.num_ctx,
+            'num_predict': self.num_predict,
+            'top_k': self.top_k,
+            'top_p': self.top_p,
+            'repeat_penalty': self.repeat_penalty
+        }
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> str:
+        # Запрос идет через общую сессию: без нового TCP соединения и проверки /api/tags
+        client = get_ollama_client()
+        options = self.ollama_options()
+        if stop:
+            options['stop'] = stop
+
+        if self.streaming and run_manager is not None:
+            tokens = []
+            for token in client.stream_generate(self.model, prompt, options, system=self.system):
+                run_manager.on_llm_new_token(token)
+                tokens.append(token)
+            return "".join(tokens)
+        return client.complete(self.model, prompt, options, system=self.system)
@@ -0,0 +1,240 @@
+# pdf_extraction.py
+import os
+
+import pymupdf
+
+import ocr_engine
+from check_pdf_type import classify_pdf_pages
+from extraction_cache import get_extraction_cache
+
+# Режимы извлечения текста:
+#   hybrid - текстовый слой для текстовых страниц, OCR только для сканов
+#   auto   - весь документ либо через текстовый слой, либо целиком через OCR
+#   ocr    - OCR всех страниц
+EXTRACTION_MODES = ("hybrid", "auto", "ocr")
+DEFAULT_EXTRACTION_MODE = os.environ.get("PDF_EXTRACTION_MODE", "hybrid")
+CACHE_ENABLED = os.environ.get("EXTRACTION_CACHE", "1") != "0"
+
+
+def merge_pages(page_texts, total_pages):
+    """Склеиваем тексты страниц в порядке страниц"""
+    all_text = []
+    for page_num in range(total_pages):
+        text = page_texts.get(page_num, "")
+        if text.strip():
+            all_text.append(f"=== Страница {page_num+1} ===\n{text}")
+    return "\n\n".join(all_text)
+
+
+def page_metadata(page_texts, methods, ocr_results=None):
+    """Постраничные метаданные: способ извлечения, размер текста, DPI, уверенность и ошибка OCR"""
+    pages = []
+    for page_num, method in enumerate(methods):
+        info = {'page': page_num + 1, 'method': method, 'chars': len(page_texts.get(page_num, "").strip())}
+        if ocr_results and page_num in ocr_results:
+            info['dpi'] = ocr_results[page_num]['dpi']
+            info['confidence'] = ocr_results[page_num]['confidence']
+            if ocr_results[page_num]['error']:
+                info['error'] = ocr_results[page_num]['error']
+        pages.append(info)
+    return pages
+
+
+def ocr_extract(pdf_path, dpi):
+    """OCR всех страниц: (текст, метаданные страниц)"""
+    print(f"🔍 OCR обработка файла: {os.path.basename(pdf_path)}")
+    ocr_results = ocr_engine.get_ocr_engine().ocr_pdf(pdf_path, dpi=dpi)
+    page_texts = {page_num: result['text'] for page_num, result in ocr_results.items()}
+    total_pages = max(page_texts) + 1 if page_texts else 0
+
+    combined_text = merge_pages(page_texts, total_pages)
+    print(f"✅ OCR завершен. Всего извлечено: {len(combined_text)} символов")
+    return combined_text, page_metadata(page_texts, ["ocr"] * total_pages, ocr_results)
+
+
+def hybrid_extract(pdf_path, dpi):
+    """Постраничное извлечение: OCR только для страниц-изображений"""
+    import pymupdf4llm  # импортируется при первом извлечении, а не при импорте модуля
+    page_types = classify_pdf_pages(pdf_path)
+    image_pages = [i for i, page_type in enumerate(page_types) if page_type == "image"]
+    layer_pages = [i for i, page_type in enumerate(page_types) if page_type != "image"]
+    methods = ["ocr" if page_type == "image" else "text" for page_type in page_types]
+
+    print(f"📑 Страниц: {len(page_types)}, с текстом: {len(layer_pages)}, для OCR: {len(image_pages)}")
+
+    # Документ без сканов обрабатываем так же, как раньше: если текста почти нет
+    # (страницы "empty" без найденных изображений) - OCR всего документа
+    if not image_pages:
+        text = pymupdf4llm.to_markdown(pdf_path)
+        if len(text.strip()) > 100:
+            return text, [{'page': i + 1, 'method': method} for i, method in enumerate(methods)]
+        print("⚠️ Мало текста в текстовом слое, используем OCR...")
+        return ocr_extract(pdf_path, dpi)
+    if not layer_pages:
+        return ocr_extract(pdf_path, dpi)
+
+    # Текстовый слой - одним вызовом, чанки возвращаются в порядке страниц
+    chunks = pymupdf4llm.to_markdown(pdf_path, pages=layer_pages, page_chunks=True)
+    page_texts = {page_num: chunk["text"] for page_num, chunk in zip(layer_pages, chunks)}
+
+    ocr_results = ocr_engine.get_ocr_engine().ocr_pdf(pdf_path, image_pages, dpi=dpi)
+    page_texts.update({page_num: result['text'] for page_num, result in ocr_results.items()})
+
+    combined_text = merge_pages(page_texts, len(page_types))
+    print(f"✅ Гибридное извлечение: {len(combined_text)} символов")
+    return combined_text, page_metadata(page_texts, methods, ocr_results)
+
+
+def split_page_types(pdf_path, mode=None):
+    """Типы страниц для извлечения частями (None - документ извлекается только целиком)
+
+    Частями извлекаются документы со сканами: их текст собирается постранично
+    и не зависит от деления на части. Текстовый слой pymupdf4llm размечает
+    по всему документу и извлекает быстро - такие PDF не делим.
+    """
+    mode = mode or DEFAULT_EXTRACTION_MODE
+    if mode == "ocr":
+        with pymupdf.open(pdf_path) as doc:
+            return ["image"] * doc.page_count
+    if mode == "hybrid":
+        try:
+            page_types = classify_pdf_pages(pdf_path)
+        except Exception as e:
+            print(f"⚠️ Ошибка классификации страниц: {e}")
+            return None
+        return page_types if "image" in page_types else None
+    return None
+
+
+def extract_page_range(pdf_path, page_numbers, page_types, dpi=None):
+    """Часть страниц документа: ({номер страницы: текст}, {номер страницы: результат OCR})"""
+    image_pages = [n for n in page_numbers if page_types[n] == "image"]
+    layer_pages = [n for n in page_numbers if page_types[n] != "image"]
+
+    page_texts, ocr_results = {}, {}
+    if layer_pages:
+        import pymupdf4llm
+        chunks = pymupdf4llm.to_markdown(pdf_path, pages=layer_pages, page_chunks=True)
+        page_texts.update({page_num: chunk["text"] for page_num, chunk in zip(layer_pages, chunks)})
+    if image_pages:
+        ocr_results = ocr_engine.get_ocr_engine().ocr_pdf(pdf_path, image_pages, dpi=dpi)
+        page_texts.update({page_num: result['text'] for page_num, result in ocr_results.items()})
+    return page_texts, ocr_results
+
+
+def merge_page_ranges(page_types, page_texts, ocr_results):
+    """Части документа -> тот же результат, что у extract_pages: (текст, метаданные страниц)"""
+    methods = ["ocr" if page_type == "image" else "text" for page_type in page_types]
+    return merge_pages(page_texts, len(page_types)), page_metadata(page_texts, methods, ocr_results)
+
+
+def extract_pages(pdf_path, dpi=None, mode=None):
+    """Извлечение текста без кэша: (текст, метаданные страниц)"""
+    mode = mode or DEFAULT_EXTRACTION_MODE
+
+    if mode == "ocr":
+        return ocr_extract(pdf_path, dpi)
+
+    if mode == "hybrid":
+        try:
+            return hybrid_extract(pdf_path, dpi)
+        except Exception as e:
+            print(f"⚠️ Ошибка гибридного извлечения: {e}")
+            print("🔄 Переходим к обычному режиму...")
+
+    # Сначала пробуем обычное извлечение
+    try:
+        import pymupdf4llm
+        text = pymupdf4llm.to_markdown(pdf_path)
+        if len(text.strip()) > 100:  # Если извлекли достаточно текста
+            print(f"✅ Обычное извлечение: {len(text)} символов")
+            return text, [{'method': 'text', 'chars': len(text)}]
+        else:
+            print("⚠️ Мало текста при обычном извлечении, используем OCR...")
+    except Exception as e:
+        print(f"⚠️ Ошибка обычного извлечения: {e}")
+        print("🔄 Переходим к OCR...")
+
+    return ocr_extract(pdf_path, dpi)
+
+
+def extraction_settings(dpi, mode):
+    """Настройки, от которых зависит результат извлечения (входят в ключ кэша)"""
+    engine = ocr_engine.get_ocr_engine()
+    settings = {
+        'dpi': dpi or engine.dpi,
+        'mode': mode,
+        'tesseract_config': engine.config,
+        'backend': engine.backend,
+        'lang': ocr_engine.DEFAULT_OCR_LANG
+    }
+    if settings['dpi'] == "auto":
+        settings['adaptive'] = [ocr_engine.ADAPTIVE_LOW_DPI, ocr_engine.ADAPTIVE_HIGH_DPI,
+                                ocr_engine.ADAPTIVE_MIN_CONFIDENCE]
+    return settings
+
+
+def cache_lookup(pdf_path, dpi=None, mode=None):
+    """Поиск в кэше извлечения: (запись или None, ключ, настройки); ключ None - кэш не используется"""
+    if not CACHE_ENABLED:
+        return None, None, None
+    cache = get_extraction_cache()
+    try:
+        settings = extraction_settings(dpi, mode or DEFAULT_EXTRACTION_MODE)
+        key = cache.make_key(pdf_path, settings)
+        entry = cache.get(key)
+    except OSError as e:
+        print(f"⚠️ Кэш извлечения недоступен: {e}")
+        return None, None, None
+
+    if entry is not None:
+        print(f"⚡ Текст взят из кэша извлечения: {entry['text_length']} символов")
+        return entry, key, settings
+    return None, key, settings
+
+
+def cache_store(pdf_path, key, settings, text, pages):
+    """Сохранение результата извлечения в кэш"""
+    # Страницы с ошибкой OCR (таймаут tesseract) в тексте отсутствуют - такой результат
+    # не кэшируем, иначе повторный запрос навсегда получит неполный текст
+    failed_pages = [page['page'] for page in pages if page.get('error')]
+    if failed_pages:
+        print(f"⚠️ Страницы с ошибками OCR {failed_pages}: результат не сохраняется в кэш")
+        return
+    if text and key is not None:
+        try:
+            get_extraction_cache().put(key, text, pages, settings, source=os.path.basename(pdf_path))
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить в кэш извлечения: {e}")
+
+
+def extraction_method(pages):
+    """Способ извлечения документа по постраничным метаданным: Standard, OCR или hybrid"""
+    methods = {page.get('method') for page in pages}
+    if 'ocr' in methods:
+        return 'hybrid' if 'text' in methods else 'OCR'
+    return 'Standard'
+
+
+def smart_extract(pdf_path, dpi=None, mode=None):
+    """Умное извлечение текста - текстовый слой где он есть, OCR где его нет: (текст, метаданные страниц)"""
+    print(f"📄 Извлечение текста из: {os.path.basename(pdf_path)}")
+    mode = mode or DEFAULT_EXTRACTION_MODE
+
+    entry, key, settings = cache_lookup(pdf_path, dpi, mode)
+    if entry is not None:
+        return entry['text'], entry.get('pages') or []
+
+    try:
+        text, pages = extract_pages(pdf_path, dpi=dpi, mode=mode)
+    except Exception as e:
+        print(f"❌ Ошибка извлечения текста: {e}")
+        return None, []
+
+    cache_store(pdf_path, key, settings, text, pages)
+    return text, pages
+
+
+def smart_extract_text(pdf_path, dpi=None, mode=None):
+    """Умное извлечение текста - текстовый слой где он есть, OCR где его нет"""
+    return smart_extract(pdf_path, dpi, mode)[0]
@@ -0,0 +1,188 @@
+# prompt_budget.py
+import importlib.util
+import os
+import re
+import threading
+
+# transformers импортируется только при загрузке токенизатора (импорт - секунды)
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
+
+# Токенизатор HF для модели Ollama (по префиксу имени); PROMPT_TOKENIZER - явный выбор
+TOKENIZER_MODELS = {
+    'qwen2.5': "Qwen/Qwen2.5-3B-Instruct",
+    'saiga': "IlyaGusev/saiga_mistral_7b_merged",
+    'mistral': "mistralai/Mistral-7B-Instruct-v0.2",
+    'llama3': "NousResearch/Meta-Llama-3.1-8B-Instruct",
+}
+PROMPT_TOKENIZER = os.environ.get("PROMPT_TOKENIZER", "")
+# Доля свободного контекста под договор (остальное - регламенты); неиспользованное отдается другой части
+CONTRACT_SHARE = float(os.environ.get("PROMPT_CONTRACT_SHARE", "0.5"))
+# Запас на служебные токены шаблона чата Ollama
+SAFETY_TOKENS = 64
+# Фрагмент, от которого после сжатия остается меньше, просто отбрасываем
+MIN_COMPRESSED_TOKENS = 120
+
+_CYRILLIC_RE = re.compile(r"[а-яёА-ЯЁ]")
+_LATIN_RE = re.compile(r"[a-zA-Z]")
+_DIGIT_RE = re.compile(r"\d")
+_SPACE_RE = re.compile(r"\s")
+
+
+def estimate_tokens(text):
+    """Оценка числа токенов без токенизатора (с запасом: кириллица дробится сильнее латиницы)"""
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    latin = len(_LATIN_RE.findall(text))
+    digits = len(_DIGIT_RE.findall(text))
+    spaces = len(_SPACE_RE.findall(text))
+    other = len(text) - cyrillic - latin - digits - spaces
+    return int((cyrillic / 2.4 + latin / 4 + digits / 2 + other) * 1.1) + 1
+
+
+class TokenCounter:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.tokenizer = None
+        self.name = "оценка"
+        tokenizer_name = PROMPT_TOKENIZER or next(
+            (repo for prefix, repo in TOKENIZER_MODELS.items() if model_name.startswith(prefix)), None
+        )
+        if tokenizer_name and TRANSFORMERS_AVAILABLE:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+                self.name = tokenizer_name
+            except Exception as e:
+                print(f"⚠️ Токенизатор {tokenizer_name} недоступен ({e}), используем оценку")
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        return estimate_tokens(text)
+
+    def truncate(self, text, max_tokens):
+        """Начало текста не длиннее max_tokens, по границе абзаца или предложения"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text[:low]
+        # Не режем посреди предложения, если граница недалеко
+        boundary = max(cut.rfind('\n'), cut.rfind('. '))
+        if boundary > low * 0.8:
+            cut = cut[:boundary + 1]
+        return cut.rstrip()
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name):
+    """Счетчик токенов на процесс: токенизатор загружается один раз"""
+    with _counters_lock:
+        counter = _counters.get(model_name)
+        if counter is None:
+            counter = TokenCounter(model_name)
+            _counters[model_name] = counter
+        return counter
+
+
+def format_document(document):
+    """Фрагмент регламента с источником и статьей - модель ссылается на них в ответе"""
+    label = document.metadata.get('source', '')
+    if document.metadata.get('article_ids'):
+        label = f"{label}, {document.metadata['article_ids']}"
+    return f"[{label}]\n{document.page_content}" if label else document.page_content
+
+
+class PromptBudget:
+    def __init__(self, model_name, num_ctx=4096, num_predict=1024, contract_share=CONTRACT_SHARE):
+        self.counter = get_token_counter(model_name)
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.contract_share = contract_share
+
+    def build(self, template, question, contract, documents):
+        """Промпт в пределах num_ctx: (промпт, использованные фрагменты, расход токенов)
+
+        template - шаблон с {context} и {question}; question - запрос с {contract}.
+        documents - фрагменты регламентов по убыванию релевантности: при нехватке
+        места первыми сжимаются и отбрасываются последние.
+        """
+        count = self.counter.count
+        instructions = count(template.format(context="", question=question.format(contract="")))
+        available = self.num_ctx - self.num_predict - SAFETY_TOKENS - instructions
+
+        blocks = [format_document(document) for document in documents]
+        block_tokens = [count(block) for block in blocks]
+        contract_tokens = count(contract)
+
+        # Договор получает свою долю, но не меньше того, что не нужно регламентам
+        contract_budget = max(int(available * self.contract_share), available - sum(block_tokens))
+        contract_text = self.counter.truncate(contract, min(contract_tokens, contract_budget))
+        contract_used = count(contract_text)
+
+        remaining = available - contract_used
+        context_parts, used_documents = [], []
+        compressed = 0
+        for document, block, tokens in zip(documents, blocks, block_tokens):
+            if tokens <= remaining:
+                context_parts.append(block)
+                used_documents.append(document)
+                remaining -= tokens
+            elif remaining >= MIN_COMPRESSED_TOKENS:
+                context_parts.append(self.counter.truncate(block, remaining))
+                used_documents.append(document)
+                compressed += 1
+                remaining = 0
+        context = "\n\n".join(context_parts)
+        prompt = template.format(context=context, question=question.format(contract=contract_text))
+
+        usage = {
+            'tokenizer': self.counter.name,
+            'num_ctx': self.num_ctx,
+            'instructions': instructions,
+            'regulations': count(context),
+            'documents_used': len(used_documents),
+            'documents_retrieved': len(documents),
+            'documents_compressed': compressed,
+            'contract': contract_used,
+            'contract_total': contract_tokens,
+            'reserved_answer': self.num_predict,
+            'prompt_total': count(prompt)
+        }
+        print(f"🧮 Токены ({usage['tokenizer']}): инструкции {usage['instructions']}, "
+              f"регламенты {usage['regulations']} ({len(used_documents)}/{len(documents)} фрагм., "
+              f"сжато {compressed}), договор {contract_used}/{contract_tokens}, "
+              f"ответ ≤{self.num_predict}, промпт {usage['prompt_total']}/{self.num_ctx}")
+        return prompt, used_documents, usage
+
+
+class BudgetedRetrievalQA:
+    def __init__(self, llm, retriever, template, budget):
+        self.llm = llm
+        self.retriever = retriever
+        self.template = template
+        self.budget = budget
+
+    def __call__(self, inputs):
+        """Как RetrievalQA: {"query", "contract"} -> {"result", "source_documents", "token_usage"}"""
+        contract = inputs.get('contract', "")
+        question = inputs['query']
+        documents = self.retriever.get_relevant_documents(question.format(contract=contract))
+        prompt, used_documents, usage = self.budget.build(self.template, question, contract, documents)
+        return {
+            'result': self.llm(prompt),
+            'source_documents': used_documents,
+            'token_usage': usage
+        }
@@ -0,0 +1,189 @@
+# regulation_index.py
+import hashlib
+import json
+import os
+import time
+
+from langchain.vectorstores import Chroma
+from langchain.schema import Document
+
+from legal_splitter import LegalTextSplitter, MIN_CHUNK_SIZE
+
+MANIFEST_FILE = "index_manifest.json"
+MANIFEST_VERSION = 3
+ADD_BATCH_SIZE = 1000  # Chroma ограничивает размер одной вставки
+CHUNK_SIZE = 1500
+# Перекрытие только для статей без пунктов, которые режутся посимвольно
+CHUNK_OVERLAP = 150
+# Табличные источники хранятся в TabularStore - в эмбеддинги идут только тексты регламентов
+TABULAR_SUFFIXES = ('.xlsx.txt', '.xls.txt')
+
+
+def read_regulation_text(file_path):
+    """Читаем обработанный регламент без служебного заголовка"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # Очищаем служебную информацию
+    if "=" * 60 in content:
+        content = content.split("=" * 60, 1)[-1].strip()
+    return content
+
+
+class RegulationIndexer:
+    def __init__(self, embeddings, persist_directory="./chroma_db",
+                 processed_path="./processed_regulations"):
+        self.embeddings = embeddings
+        self.persist_directory = persist_directory
+        self.processed_path = processed_path
+        self.manifest_path = os.path.join(persist_directory, MANIFEST_FILE)
+        # Фрагменты по границам статей и пунктов, номера статей - в метаданных
+        self.text_splitter = LegalTextSplitter(chunk_size=CHUNK_SIZE, fallback_overlap=CHUNK_OVERLAP)
+
+    def splitter_settings(self):
+        """Настройки разбиения: при их изменении индекс пересобирается целиком"""
+        return {
+            'splitter': type(self.text_splitter).__name__,
+            'chunk_size': CHUNK_SIZE,
+            'chunk_overlap': CHUNK_OVERLAP,
+            'min_chunk_size': MIN_CHUNK_SIZE
+        }
+
+    def load_manifest(self):
+        """Манифест индекса: файл -> хэш содержимого и id его фрагментов"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def scan_sources(self):
+        """Текущие регламенты: {файл: (хэш содержимого, текст)}"""
+        sources = {}
+        if not os.path.exists(self.processed_path):
+            return sources
+
+        for file in sorted(os.listdir(self.processed_path)):
+            if not file.endswith('.txt') or file == "processing_report.txt":
+                continue
+            if file.lower().endswith(TABULAR_SUFFIXES):
+                continue
+            try:
+                content = read_regulation_text(os.path.join(self.processed_path, file))
+            except Exception as e:
+                print(f"❌ Ошибка загрузки {file}: {e}")
+                continue
+
+            if len(content.strip()) > 100:  # Только содержательные документы
+                # Хэшируем очищенный текст: дата обработки в заголовке не влияет
+                digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                sources[file] = (digest, content)
+        return sources
+
+    def split_file(self, file, digest, content):
+        """Фрагменты одного регламента со стабильными id"""
+        doc = Document(
+            page_content=content,
+            metadata={
+                "source": file.replace('.txt', ''),
+                "type": "regulation",
+                "length": len(content)
+            }
+        )
+        splits = self.text_splitter.split_documents([doc])
+        # Путь входит в id: копии файла с одинаковым текстом не затирают фрагменты друг друга
+        source_key = hashlib.sha256(file.encode('utf-8')).hexdigest()[:8]
+        ids = [f"{source_key}-{digest[:16]}-{i}" for i in range(len(splits))]
+        return splits, ids
+
+    def add_chunks(self, vectorstore, splits, ids):
+        """Эмбеддинг и запись фрагментов пачками"""
+        for start in range(0, len(splits), ADD_BATCH_SIZE):
+            vectorstore.add_documents(splits[start:start + ADD_BATCH_SIZE],
+                                      ids=ids[start:start + ADD_BATCH_SIZE])
+
+    def sync(self):
+        """Инкрементальная синхронизация векторной базы с processed_regulations"""
+        start_time = time.time()
+        os.makedirs(self.persist_directory, exist_ok=True)
+        vectorstore = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings
+        )
+
+        manifest = self.load_manifest()
+        settings = self.splitter_settings()
+        if (manifest is None or manifest.get('version') != MANIFEST_VERSION
+                or manifest.get('settings') != settings):
+            # База без манифеста (или с другим разбиением) не сопоставима с файлами -
+            # пересобираем один раз, дальше обновления будут инкрементальными
+            if vectorstore.get(limit=1, include=[])['ids']:
+                print("🔄 Манифест индекса не найден или устарел - полная пересборка")
+                vectorstore.delete_collection()
+                vectorstore = Chroma(
+                    persist_directory=self.persist_directory,
+                    embedding_function=self.embeddings
+                )
+            manifest = {'version': MANIFEST_VERSION, 'settings': settings, 'files': {}}
+
+        indexed = manifest['files']
+        sources = self.scan_sources()
+
+        removed = [file for file in indexed if file not in sources]
+        changed = [file for file, (digest, _) in sources.items()
+                   if file not in indexed or indexed[file]['sha256'] != digest]
+
+        # Удаляем фрагменты удаленных и измененных файлов
+        for file in removed + [f for f in changed if f in indexed]:
+            old_ids = indexed[file]['chunk_ids']
+            if old_ids:
+                vectorstore.delete(ids=old_ids)
+            if file in removed:
+                print(f"🗑️ Удален из индекса: {file} ({len(old_ids)} фрагментов)")
+            del indexed[file]
+
+        # Эмбеддим только новые и измененные файлы. Фрагменты мелких файлов
+        # копятся до полной пачки - эмбеддинг и запись идут крупными батчами
+        pending_splits, pending_ids, pending_files = [], [], []
+
+        def flush():
+            if pending_splits:
+                self.add_chunks(vectorstore, pending_splits, pending_ids)
+            for file, entry in pending_files:
+                indexed[file] = entry
+                print(f"✅ Проиндексирован: {file} ({len(entry['chunk_ids'])} фрагментов)")
+            # Сохраняем прогресс после каждой пачки - прерванная сборка продолжится
+            self.save_manifest(manifest)
+            pending_splits.clear()
+            pending_ids.clear()
+            pending_files.clear()
+
+        total_chunks = 0
+        for file in changed:
+            digest, content = sources[file]
+            splits, ids = self.split_file(file, digest, content)
+            pending_splits.extend(splits)
+            pending_ids.extend(ids)
+            pending_files.append((file, {'sha256': digest, 'chunk_ids': ids, 'indexed': time.time()}))
+            total_chunks += len(ids)
+            if len(pending_splits) >= ADD_BATCH_SIZE:
+                flush()
+        flush()
+
+        if hasattr(vectorstore, 'persist'):
+            vectorstore.persist()
+        self.save_manifest(manifest)
+
+        unchanged = len(sources) - len(changed)
+        elapsed = time.time() - start_time
+        rate = total_chunks / elapsed if elapsed > 0 else 0.0
+        print(f"📚 Индекс регламентов: {len(sources)} файлов, новых/измененных {len(changed)}, "
+              f"удалено {len(removed)}, без изменений {unchanged}")
+        print(f"⏱️ Добавлено {total_chunks} фрагментов за {elapsed:.1f} с ({rate:.1f} фрагм./с)")
+        return vectorstore
@@ -0,0 +1,495 @@
+# sanctions_screening.py
+import os
+import re
+import threading
+import time
+
+from name_matching import transliterate, has_cyrillic, trigrams, similarity
+from tabular_store import TabularStore, TABULAR_DB
+
+SANCTIONS_FILE = os.environ.get("SANCTIONS_FILE", "./regulations/санционные списки США, ЕС, UK.xlsx")
+# Обработанная текстовая выгрузка того же файла (universal_processor.py)
+SANCTIONS_TEXT_FILE = os.environ.get(
+    "SANCTIONS_TEXT_FILE", "./processed_regulations/санционные списки США, ЕС, UK.xlsx.txt"
+)
+# Минимальная доля общих слов для нечеткого совпадения
+MIN_TOKEN_SCORE = float(os.environ.get("SANCTIONS_MIN_SCORE", "0.6"))
+# Минимальное сходство (Левенштейн / Джаро-Винклер по словам) для нечеткого совпадения по написанию
+MIN_FUZZY_SCORE = float(os.environ.get("SANCTIONS_FUZZY_SCORE", "0.88"))
+# Кандидатов после отбора по триграммам, которые сравниваются посимвольно
+FUZZY_CANDIDATES = 20
+# Минимальный коэффициент Дайса по триграммам для посимвольного сравнения
+MIN_TRIGRAM_DICE = 0.4
+# Слова и триграммы, встречающиеся в большей доле названий, не помогают отбору кандидатов
+MAX_TRIGRAM_SHARE = 0.05
+
+# Организационно-правовые формы не отличают одно лицо от другого
+LEGAL_FORMS = {
+    'ооо', 'оао', 'зао', 'пао', 'ао', 'тоо', 'ип', 'гуп', 'фгуп',
+    'llc', 'ltd', 'limited', 'inc', 'corp', 'co', 'jsc', 'ojsc', 'cjsc', 'pjsc',
+    'plc', 'gmbh', 'ag', 'sa', 'srl', 'bv', 'nv', 'fze', 'fzco', 'llp'
+}
+
+# Общие слова названий: совпадение только по ним не указывает на то же лицо
+GENERIC_WORDS = {
+    'international', 'trading', 'trade', 'company', 'group', 'holding', 'holdings', 'industrial',
+    'industries', 'commercial', 'services', 'service', 'enterprises', 'enterprise', 'general',
+    'global', 'import', 'export', 'de', 'y', 'and', 'of', 'the',
+    'международная', 'торговая', 'компания', 'группа', 'холдинг', 'торговый', 'дом'
+}
+
+_DOTS_RE = re.compile(r"\.")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_name(name):
+    """Нормализация названия: регистр, ё, пунктуация, правовые формы"""
+    text = str(name).casefold().replace('ё', 'е')
+    # Точки убираем без пробела, чтобы "S.A." и "SA" совпадали
+    text = _NON_WORD_RE.sub(' ', _DOTS_RE.sub('', text))
+    return ' '.join(token for token in text.split() if token not in LEGAL_FORMS)
+
+
+# Стороны и банки договора: "ООО «Ромашка»", "Alpha Trading LLC", "Банк получателя: ..."
+_QUOTED_PARTY_RE = re.compile(
+    r"\b(ООО|ОАО|ЗАО|ПАО|АО|ТОО|ИП|ГУП|ФГУП|LLC|JSC|OJSC|CJSC|PJSC|LLP)\s*[«\"“„]([^»\"”“\n]{2,80})[»\"”“]"
+)
+_LATIN_PARTY_RE = re.compile(
+    r"\b((?:[A-Z][\w&'-]*\.?,?\s+){1,5}?)(LLC|L\.L\.C\.|Ltd\.?|LTD|Limited|LIMITED|Inc\.?|INC|Corp\.?|CORP|"
+    r"JSC|PJSC|GmbH|GMBH|AG|S\.A\.|SA|PLC|LLP|FZE|FZCO|B\.V\.|BV)(?![\w])"
+)
+_BANK_LINE_RE = re.compile(
+    r"(?:Банк(?:\s+(?:получателя|плательщика|бенефициара))?|Beneficiary(?:'s)?\s+[Bb]ank|"
+    r"Bank\s+of\s+(?:beneficiary|the\s+beneficiary)|Bank\s+name|Наименование\s+банка)\s*:\s*([^\n;,]{3,80})"
+)
+MAX_PARTY_NAMES = 50
+
+
+def extract_party_names(text, limit=MAX_PARTY_NAMES):
+    """Названия сторон и банков из текста договора (для нечеткой проверки screen_names)"""
+    names = []
+    for match in _QUOTED_PARTY_RE.finditer(text):
+        names.append(f"{match.group(1)} {match.group(2).strip()}")
+    for match in _LATIN_PARTY_RE.finditer(text):
+        names.append(f"{match.group(1).strip()} {match.group(2)}")
+    for match in _BANK_LINE_RE.finditer(text):
+        names.append(match.group(1).strip(" .,"))
+
+    # Повторы (одно лицо упоминается многократно) и строки без названия отбрасываем
+    unique = {}
+    for name in names:
+        key = normalize_name(name)
+        if key and key not in unique:
+            unique[key] = name
+    return list(unique.values())[:limit]
+
+
+def is_active(value):
+    """IS_ACTIVE в выгрузке бывает 1, 1.0, '1' или пустым"""
+    try:
+        return int(float(value)) == 1
+    except (TypeError, ValueError):
+        return False
+
+
+def load_sanctions_xlsx(xlsx_path):
+    """Записи санкционных листов (OFAC/EU/UK) из Excel"""
+    import pandas as pd  # нужен только для исходного xlsx
+    sheets = pd.read_excel(xlsx_path, sheet_name=None, dtype=str)
+    entries = []
+    for sheet_name, df in sheets.items():
+        if 'P_NAME' not in df.columns:
+            continue
+        df = df.fillna("")
+        # В листе EU колонка идентификатора называется иначе - берем первую
+        id_column = 'ID' if 'ID' in df.columns else df.columns[0]
+        for row in df.to_dict('records'):
+            entries.append({
+                'id': row.get(id_column, ""),
+                'list': sheet_name,
+                'name': row.get('P_NAME', ""),
+                'original_name': row.get('P_ORIGINAL_NAME', ""),
+                'comment': row.get('P_COMMENT', ""),
+                'active': is_active(row.get('IS_ACTIVE'))
+            })
+    return entries
+
+
+def load_sanctions_text(text_path):
+    """Записи санкционных листов из текстовой выгрузки processed_regulations"""
+    entries = []
+    sheet_name, headers, pending = None, None, None
+
+    def add_row(line):
+        values = line.split(' | ')
+        # P_COMMENT может содержать разделитель - выравниваем колонки после него по правому краю
+        comment_idx = headers.index('P_COMMENT') if 'P_COMMENT' in headers else len(headers)
+        tail = len(headers) - comment_idx - 1
+        row = dict(zip(headers[:comment_idx], values[:comment_idx]))
+        if comment_idx < len(headers):
+            row['P_COMMENT'] = ' | '.join(values[comment_idx:len(values) - tail])
+            row.update(zip(headers[comment_idx + 1:], values[len(values) - tail:]))
+        entries.append({
+            'id': row.get(headers[0], "").strip(),
+            'list': sheet_name,
+            'name': row.get('P_NAME', "").strip(),
+            'original_name': row.get('P_ORIGINAL_NAME', "").strip(),
+            'comment': row.get('P_COMMENT', "").strip(),
+            'active': is_active(row.get('IS_ACTIVE'))
+        })
+
+    with open(text_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('=== ЛИСТ: '):
+                sheet_name, headers, pending = line[len('=== ЛИСТ: '):].rstrip(' ='), None, None
+                continue
+            if line.startswith('ЗАГОЛОВКИ: '):
+                headers = line[len('ЗАГОЛОВКИ: '):].split(' | ')
+                continue
+            if headers is None or 'P_NAME' not in headers:
+                continue
+            if pending is None and not line.strip():
+                continue
+
+            # Многострочный комментарий: копим строки, пока не наберутся все колонки
+            pending = line if pending is None else f"{pending} {line}"
+            if len(pending.split(' | ')) >= len(headers):
+                add_row(pending)
+                pending = None
+    return entries
+
+
+def load_sanctions_store(db_path):
+    """Записи санкционных листов из табличного хранилища (universal_processor.py)"""
+    store = TabularStore(db_path)
+    entries = []
+    for table in store.tables():
+        if 'P_NAME' not in table['columns']:
+            continue
+        # В листе EU колонка идентификатора называется иначе - берем первую
+        id_column = 'ID' if 'ID' in table['columns'] else table['columns'][0]
+        wanted = [col for col in (id_column, 'P_NAME', 'P_ORIGINAL_NAME', 'P_COMMENT', 'IS_ACTIVE')
+                  if col in table['columns']]
+        for row in store.query(table['table_name'], columns=wanted):
+            entries.append({
+                'id': row.get(id_column, ""),
+                'list': table['sheet'],
+                'name': row.get('P_NAME', ""),
+                'original_name': row.get('P_ORIGINAL_NAME', ""),
+                'comment': row.get('P_COMMENT', ""),
+                'active': is_active(row.get('IS_ACTIVE'))
+            })
+    return entries
+
+
+def load_sanctions(path):
+    """Записи санкционных листов из Excel, табличного хранилища или текстовой выгрузки"""
+    if path.lower().endswith('.txt'):
+        return load_sanctions_text(path)
+    if path.lower().endswith(('.sqlite', '.db')):
+        return load_sanctions_store(path)
+    return load_sanctions_xlsx(path)
+
+
+class SanctionsIndex:
+    def __init__(self, entries, include_inactive=False):
+        self.entries = [entry for entry in entries if include_inactive or entry['active']]
+        self.skipped = len(entries) - len(self.entries)
+        self.version = None  # номер версии назначает SanctionsIndexManager
+
+        self._exact = {}      # нормализованное название -> [варианты]
+        self._postings = {}   # слово -> {варианты}
+        self._variants = []   # (номер записи, нормализованное название, слова)
+        self._by_rarest = {}  # самое редкое слово варианта -> [варианты] (поиск в тексте)
+        self._trigrams = {}   # триграмма -> [варианты] (нечеткий поиск)
+        self._gram_counts = {}  # вариант -> число его триграмм
+        self._build()
+
+    def _build(self):
+        start_time = time.time()
+        for entry_idx, entry in enumerate(self.entries):
+            keys = {normalize_name(entry['name']), normalize_name(entry['original_name'])}
+            # Индексируем и транслитерацию: кириллическое написание находит латинскую запись
+            keys |= {transliterate(key) for key in keys}
+            for key in keys:
+                if not key:
+                    continue
+                variant = len(self._variants)
+                tokens = tuple(key.split())
+                self._variants.append((entry_idx, key, tokens))
+                self._exact.setdefault(key, []).append(variant)
+                for token in set(tokens):
+                    self._postings.setdefault(token, set()).add(variant)
+                if not has_cyrillic(key):
+                    grams = trigrams(key)
+                    self._gram_counts[variant] = len(grams)
+                    for gram in grams:
+                        self._trigrams.setdefault(gram, []).append(variant)
+
+        for variant, (_, _, tokens) in enumerate(self._variants):
+            rarest = min(tokens, key=lambda token: len(self._postings[token]))
+            self._by_rarest.setdefault(rarest, []).append(variant)
+
+        # Слишком частые триграммы (" ba", "ion") только раздувают список кандидатов
+        max_postings = max(10, int(len(self._variants) * MAX_TRIGRAM_SHARE))
+        self._trigrams = {gram: variants for gram, variants in self._trigrams.items()
+                          if len(variants) <= max_postings}
+
+        self.build_time = time.time() - start_time
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'skipped_inactive': self.skipped,
+            'name_variants': len(self._variants),
+            'tokens': len(self._postings),
+            'trigrams': len(self._trigrams),
+            'build_seconds': round(self.build_time, 3)
+        }
+
+    def _hit(self, variant, match, score):
+        entry_idx, key, _ = self._variants[variant]
+        entry = self.entries[entry_idx]
+        return {
+            'entry_id': entry['id'],
+            'list': entry['list'],
+            'name': entry['name'],
+            'original_name': entry['original_name'],
+            'matched_on': key,
+            'match': match,
+            'score': round(score, 3)
+        }
+
+    def _collect(self, scored, limit):
+        """Лучший результат на запись, по убыванию оценки"""
+        best = {}
+        for variant, match, score in scored:
+            entry_idx = self._variants[variant][0]
+            if entry_idx not in best or score > best[entry_idx][2]:
+                best[entry_idx] = (variant, match, score)
+        ranked = sorted(best.values(), key=lambda item: -item[2])[:limit]
+        return [self._hit(variant, match, score) for variant, match, score in ranked]
+
+    def _token_matches(self, query_key, min_score):
+        """Совпадения по общим словам (contains / partial)"""
+        # Кандидаты - варианты с общими словами; частые слова ("de", "bank")
+        # кандидатов не отбирают, но учитываются в оценке
+        query_tokens = set(query_key.split())
+        max_postings = max(10, int(len(self._variants) * MAX_TRIGRAM_SHARE))
+        selective = [token for token in query_tokens
+                     if len(self._postings.get(token, ())) <= max_postings] or query_tokens
+        candidates = set()
+        for token in selective:
+            candidates.update(self._postings.get(token, ()))
+        scored = []
+        for variant in candidates:
+            variant_tokens = set(self._variants[variant][2])
+            shared = query_tokens & variant_tokens
+            common = len(shared)
+            if common == len(variant_tokens):
+                # Все слова санкционного названия есть в запросе (как contains в бэкенде)
+                score = common / len(query_tokens)
+                scored.append((variant, 'contains', max(score, min_score)))
+            else:
+                score = common / max(len(query_tokens), len(variant_tokens))
+                # Частичное совпадение - только если среди общих слов есть отличительные
+                if score >= min_score and shared - GENERIC_WORDS:
+                    scored.append((variant, 'partial', score))
+        return scored
+
+    def _fuzzy_matches(self, query_key, min_score):
+        """Нечеткие совпадения: отбор по общим триграммам, затем посимвольное сравнение"""
+        query_grams = trigrams(query_key)
+        shared = {}
+        for gram in query_grams:
+            for variant in self._trigrams.get(gram, ()):
+                shared[variant] = shared.get(variant, 0) + 1
+        if not shared:
+            return []
+
+        # Коэффициент Дайса отсекает кандидатов до дорогого посимвольного сравнения
+        dice = {variant: 2 * common / (len(query_grams) + self._gram_counts[variant])
+                for variant, common in shared.items()}
+        candidates = [variant for variant in sorted(dice, key=lambda variant: -dice[variant])[:FUZZY_CANDIDATES]
+                      if dice[variant] >= MIN_TRIGRAM_DICE]
+        query_sorted = ' '.join(sorted(query_key.split()))
+        scored = []
+        for variant in candidates:
+            key, tokens = self._variants[variant][1], self._variants[variant][2]
+            # Порядок слов в ФИО часто разный - сравниваем и отсортированные слова
+            score = similarity(query_key, key, min_score)
+            if score < min_score:
+                score = similarity(query_sorted, ' '.join(sorted(tokens)), min_score)
+            if score >= min_score:
+                scored.append((variant, 'fuzzy', score))
+        return scored
+
+    def screen_name(self, name, limit=10, min_score=None, fuzzy_score=None):
+        """Точные, по общим словам и нечеткие (с транслитерацией) совпадения для названия"""
+        min_score = MIN_TOKEN_SCORE if min_score is None else min_score
+        fuzzy_score = MIN_FUZZY_SCORE if fuzzy_score is None else fuzzy_score
+        key = normalize_name(name)
+        if not key:
+            return []
+        latin_key = transliterate(key)
+
+        exact = [(variant, 'exact', 1.0)
+                 for query_key in {key, latin_key} for variant in self._exact.get(query_key, ())]
+        if exact:
+            return self._collect(exact, limit)
+
+        scored = self._token_matches(latin_key, min_score)
+        if key != latin_key:
+            scored += self._token_matches(key, min_score)
+        scored += self._fuzzy_matches(latin_key, fuzzy_score)
+        return self._collect(scored, limit)
+
+    def screen_names(self, names, limit=10, min_score=None, fuzzy_score=None):
+        """Пакетная проверка контрагентов: {название: [совпадения]}, повторы считаются один раз"""
+        results = {}
+        by_key = {}
+        for name in names:
+            key = normalize_name(name)
+            if key not in by_key:
+                by_key[key] = self.screen_name(name, limit, min_score, fuzzy_score)
+            results[name] = by_key[key]
+        return results
+
+    def screen_text(self, text, limit=20):
+        """Санкционные названия, целиком встречающиеся в тексте договора"""
+        normalized = normalize_name(text)
+        scored = []
+        for form in {normalized, transliterate(normalized)}:
+            padded = f" {form} "
+            text_tokens = set(form.split())
+            for token in text_tokens:
+                for variant in self._by_rarest.get(token, ()):
+                    _, key, tokens = self._variants[variant]
+                    if all(t in text_tokens for t in tokens) and f" {key} " in padded:
+                        scored.append((variant, 'in_text', 1.0))
+        return self._collect(scored, limit)
+
+
+class SanctionsIndexManager:
+    def __init__(self, paths=None, interval=None):
+        # Исходный Excel приоритетнее; без него - табличное хранилище или текстовая выгрузка
+        self.paths = paths or (SANCTIONS_FILE, TABULAR_DB, SANCTIONS_TEXT_FILE)
+        self.interval = interval or float(os.environ.get("SANCTIONS_RELOAD_INTERVAL", "60"))
+
+        self._index = None
+        self._lock = threading.Lock()         # защищает ссылку на текущий индекс и статус
+        self._reload_lock = threading.Lock()  # одна пересборка одновременно
+        self._watcher = None
+        self._stop = threading.Event()
+
+        self.version = 0
+        self.source = None
+        self.fingerprint = None
+        self.loaded_at = None
+        self.reload_seconds = None
+        self.last_error = None
+
+    def resolve_source(self):
+        return next((path for path in self.paths if os.path.exists(path)), None)
+
+    def file_fingerprint(self, path):
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def current(self):
+        """Текущий снимок индекса: запрос работает с ним до конца, даже если идет замена"""
+        with self._lock:
+            return self._index
+
+    def reload(self, force=False):
+        """Сборка нового индекса и атомарная замена; True если индекс обновлен"""
+        with self._reload_lock:
+            path = self.resolve_source()
+            if path is None:
+                print(f"⚠️ Файл санкционных списков не найден: {self.paths[0]}")
+                return False
+
+            fingerprint = self.file_fingerprint(path)
+            if not force and fingerprint == self.fingerprint:
+                return False
+
+            print(f"📋 Загрузка санкционных списков: {os.path.basename(path)}")
+            start_time = time.time()
+            try:
+                index = SanctionsIndex(load_sanctions(path))
+            except Exception as e:
+                # Старый индекс продолжает обслуживать запросы
+                print(f"❌ Ошибка загрузки санкционных списков: {e}")
+                with self._lock:
+                    self.last_error = str(e)
+                return False
+
+            # Файл могли дописывать во время чтения - проверим в следующем цикле
+            if self.file_fingerprint(path) != fingerprint:
+                fingerprint = None
+
+            with self._lock:
+                self.version += 1
+                index.version = self.version
+                self._index = index
+                self.source = path
+                self.fingerprint = fingerprint
+                self.loaded_at = time.time()
+                self.reload_seconds = self.loaded_at - start_time
+                self.last_error = None
+
+            stats = index.stats()
+            print(f"✅ Санкционный индекс v{self.version}: {stats['entries']} записей, "
+                  f"{stats['name_variants']} вариантов названий ({self.reload_seconds:.2f} с)")
+            return True
+
+    def start_watching(self):
+        """Фоновый поток: проверяет изменение файла и пересобирает индекс"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="sanctions-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"❌ Ошибка проверки санкционных списков: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                'loaded': self._index is not None,
+                'version': self.version,
+                'source': self.source,
+                'loaded_at': self.loaded_at,
+                'reload_seconds': round(self.reload_seconds, 3) if self.reload_seconds is not None else None,
+                'check_interval': self.interval,
+                'last_error': self.last_error,
+                'index': self._index.stats() if self._index is not None else None
+            }
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_sanctions_manager():
+    """Менеджер санкционного индекса: первая загрузка синхронно, далее - слежение за файлом"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SanctionsIndexManager()
+            _manager.reload()
+            _manager.start_watching()
+        return _manager
+
+
+def get_sanctions_index():
+    """Текущий снимок индекса санкционных списков (None если файл не найден)"""
+    return get_sanctions_manager().current()
@@ -8,11 +8,13 @@ from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.llms.ollama import Ollama
 import json
+from contract_mapreduce import prepare_contract_input, MAP_REDUCE_ENABLED
 
 class ContractAnalyzer:
-    def __init__(self, regulations_path="./regulations", model_name="llama3.1:8b"):
+    def __init__(self, regulations_path="./regulations", model_name="llama3.1:8b", map_reduce=MAP_REDUCE_ENABLED):
         self.regulations_path = regulations_path
         self.model_name = model_name
+        self.map_reduce = map_reduce
         self.regulations_index = None
         
         # Настройка LLM и embeddings
@@ -90,6 +92,16 @@ class ContractAnalyzer:
         
         print("🔍 Анализ договора...")
         
+        try:
+            # Длинный договор проверяем целиком: выписки по разделам сворачиваются в сводку
+            contract_input, _ = prepare_contract_input(
+                contract_text, lambda prompt: Settings.llm.complete(prompt).text,
+                enabled=self.map_reduce, fallback_chars=4000
+            )
+        except Exception as e:
+            print(f"❌ Ошибка анализа разделов договора: {str(e)}")
+            return None
+        
         # Формируем промпт для анализа
         analysis_prompt = f"""
 Ты - эксперт по анализу договоров и соблюдению санкционного законодательства.
@@ -99,7 +111,7 @@ class ContractAnalyzer:
 2. Укажи КОНКРЕТНУЮ причину решения со ссылкой на соответствующий регламент или документ
 
 ДОГОВОР ДЛЯ АНАЛИЗА:
-{contract_text[:4000]}  # Ограничиваем размер для лучшей обработки
+{contract_input}
 
 КРИТЕРИИ ПРОВЕРКИ:
 - Санкционные списки США, ЕС, UK
@@ -239,6 +251,8 @@ def main():
     parser.add_argument("--model", default="llama3.1:8b", help="Модель Ollama (по умолчанию: llama3.1:8b)")
     parser.add_argument("--regulations", default="./regulations", help="Папка с регламентами")
     parser.add_argument("--no-log", action="store_true", help="Не сохранять лог анализа")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Без map-reduce: анализировать только начало длинного договора")
     
     args = parser.parse_args()
     
@@ -249,7 +263,8 @@ def main():
     # Создаем анализатор
     analyzer = ContractAnalyzer(
         regulations_path=args.regulations,
-        model_name=args.model
+        model_name=args.model,
+        map_reduce=not args.single_pass
     )
     
     # Загружаем регламенты
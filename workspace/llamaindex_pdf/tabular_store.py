@@ -0,0 +1,141 @@
+# tabular_store.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+TABULAR_DB = os.environ.get("TABULAR_DB", "./processed_regulations/tabular.sqlite")
+# Колонки, по которым ищут: санкционные списки и таблицы курсов
+INDEXED_COLUMNS = ('ID', 'P_NAME', 'P_ORIGINAL_NAME', 'IS_ACTIVE', 'P_DICT', 'CODE', 'CURRENCY', 'DATE')
+# Чтение через mmap: страницы базы не копируются в память процесса
+MMAP_SIZE = 256 * 1024 * 1024
+
+_IDENT_RE = re.compile(r"[^0-9A-Za-z_]+")
+
+
+def table_name(source, sheet):
+    """Имя таблицы для листа источника (только безопасные символы)"""
+    # Кириллица в имени вырезается - уникальность дает хэш источника и листа
+    slug = _IDENT_RE.sub('_', f"{os.path.splitext(source)[0]}_{sheet}").strip('_').lower()[:40]
+    digest = hashlib.sha1(f"{source}\0{sheet}".encode('utf-8')).hexdigest()[:10]
+    return f"t_{slug}_{digest}" if slug else f"t_{digest}"
+
+
+def _quote(name):
+    """Идентификатор SQL в кавычках (заголовки колонок Excel бывают любыми)"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class TabularStore:
+    def __init__(self, db_path=TABULAR_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS catalog (
+                    source TEXT NOT NULL,
+                    sheet TEXT NOT NULL,
+                    table_name TEXT NOT NULL UNIQUE,
+                    columns TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    updated TEXT NOT NULL,
+                    PRIMARY KEY (source, sheet)
+                )
+            """)
+
+    def _connect(self):
+        # Соединение на поток: sqlite3 не разделяет соединения между потоками
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def write_source(self, source, sheets):
+        """Заменяем все листы источника: {лист: DataFrame со строковыми колонками}"""
+        conn = self._connect()
+        total_rows = 0
+        with conn:
+            self._drop_source(conn, source)
+            for sheet, df in sheets.items():
+                table = table_name(source, sheet)
+                columns = [str(col) for col in df.columns]
+                column_defs = ", ".join(f'{_quote(col)} TEXT' for col in columns)
+                conn.execute(f'CREATE TABLE "{table}" ({column_defs})')
+
+                placeholders = ", ".join("?" * len(columns))
+                conn.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})',
+                                 df.itertuples(index=False, name=None))
+
+                for col in columns:
+                    if col.upper() in INDEXED_COLUMNS:
+                        conn.execute(f'CREATE INDEX {_quote(table + "__" + col)} ON "{table}" ({_quote(col)} COLLATE NOCASE)')
+
+                conn.execute("INSERT INTO catalog VALUES (?, ?, ?, ?, ?, ?)",
+                             (source, sheet, table, json.dumps(columns, ensure_ascii=False),
+                              len(df), datetime.now().isoformat()))
+                total_rows += len(df)
+        return total_rows
+
+    def _drop_source(self, conn, source):
+        for (table,) in conn.execute("SELECT table_name FROM catalog WHERE source = ?", (source,)).fetchall():
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        conn.execute("DELETE FROM catalog WHERE source = ?", (source,))
+
+    def remove_source(self, source):
+        """Удаляем все листы источника"""
+        conn = self._connect()
+        with conn:
+            self._drop_source(conn, source)
+
+    def has_source(self, source):
+        row = self._connect().execute("SELECT 1 FROM catalog WHERE source = ? LIMIT 1", (source,)).fetchone()
+        return row is not None
+
+    def tables(self, source=None):
+        """Каталог: [{source, sheet, table_name, columns, rows, updated}]"""
+        query = "SELECT source, sheet, table_name, columns, rows, updated FROM catalog"
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+        return [
+            {'source': src, 'sheet': sheet, 'table_name': table, 'columns': json.loads(columns),
+             'rows': rows, 'updated': updated}
+            for src, sheet, table, columns, rows, updated in self._connect().execute(query, params)
+        ]
+
+    def query(self, table, columns=None, where=None, limit=None):
+        """Строки таблицы как словари; where - {колонка: значение} (без учета регистра)"""
+        known = next((t['columns'] for t in self.tables() if t['table_name'] == table), None)
+        if known is None:
+            raise KeyError(f"Таблица не найдена: {table}")
+        columns = columns or known
+        unknown = [col for col in list(columns) + list(where or {}) if col not in known]
+        if unknown:
+            raise KeyError(f"Неизвестные колонки: {unknown}")
+
+        sql = "SELECT " + ", ".join(_quote(col) for col in columns) + f' FROM {_quote(table)}'
+        params = []
+        if where:
+            sql += " WHERE " + " AND ".join(f"{_quote(col)} = ? COLLATE NOCASE" for col in where)
+            params = list(where.values())
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(columns, row)) for row in self._connect().execute(sql, params)]
+
+    def iter_rows(self, columns, source=None):
+        """Строки всех листов, где есть нужные колонки: (источник, лист, {колонка: значение})"""
+        for table in self.tables(source):
+            present = [col for col in columns if col in table['columns']]
+            if not present:
+                continue
+            sql = "SELECT " + ", ".join(_quote(col) for col in present) + f" FROM {_quote(table['table_name'])}"
+            for row in self._connect().execute(sql):
+                yield table['source'], table['sheet'], dict(zip(present, row))
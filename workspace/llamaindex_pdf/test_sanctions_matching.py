@@ -0,0 +1,59 @@
+# test_sanctions_matching.py
+import pytest
+
+from name_matching import similarity
+from sanctions_screening import SanctionsIndex, MIN_FUZZY_SCORE, extract_party_names, normalize_name
+
+SANCTIONED = [
+    "HONG KONG ELECTRONICS",
+    "INTERNATIONAL PACIFIC TRADING INC",
+    "INDUSTRIAL MINERA Y PECUARIA SA",
+    "COMERCIALIZADORA DE CARNES LTDA",
+    "SBERBANK ROSSII",
+    "GAZPROMBANK",
+    "ROSOBORONEXPORT",
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    entries = [{'id': str(i), 'list': 'OFAC', 'name': name, 'original_name': '', 'comment': '', 'active': True}
+               for i, name in enumerate(SANCTIONED)]
+    return SanctionsIndex(entries)
+
+
+# Обычные компании, у которых с санкционной записью общее только слово или начало
+@pytest.mark.parametrize("company, sanctioned", [
+    ("Samsung Electronics Co Ltd", "HONG KONG ELECTRONICS"),
+    ("International Trading Company LLC", "INTERNATIONAL PACIFIC TRADING INC"),
+    ("Industrial Machinery Trading", "INDUSTRIAL MINERA Y PECUARIA SA"),
+    ("COMERCIAL DE RODAJES", "COMERCIALIZADORA DE CARNES LTDA"),
+])
+def test_no_false_hits(index, company, sanctioned):
+    assert similarity(normalize_name(company), normalize_name(sanctioned), MIN_FUZZY_SCORE) < MIN_FUZZY_SCORE
+    assert index.screen_name(company) == []
+
+
+@pytest.mark.parametrize("query, sanctioned", [
+    ("ПАО Сбербанк России", "SBERBANK ROSSII"),
+    ("Sberbnk Rossii", "SBERBANK ROSSII"),
+    ("Gazprombnk", "GAZPROMBANK"),
+    ("Gaz prom bank", "GAZPROMBANK"),
+    ("Rosoboroneksport", "ROSOBORONEXPORT"),
+    ("Hong Kong Electronic", "HONG KONG ELECTRONICS"),
+])
+def test_variants_still_match(index, query, sanctioned):
+    assert [hit['name'] for hit in index.screen_name(query)][:1] == [sanctioned]
+
+
+def test_party_names_from_contract_text(index):
+    text = ("ТОО «Альфа Трейд», именуемое Покупатель, и Hong Kong Electronik Co., Ltd, именуемая Продавец.\n"
+            "Банк получателя: Sberbank Rossii, SWIFT SABRRUMM\n"
+            "Покупатель ТОО «Альфа Трейд» оплачивает товар.")
+    names = extract_party_names(text)
+    assert names == ["ТОО Альфа Трейд", "Hong Kong Electronik Co., Ltd", "Sberbank Rossii"]
+
+    # Опечатка в названии стороны находится нечетким сравнением, а не поиском в тексте
+    matches = index.screen_names(names)
+    assert [hit['name'] for hit in matches["Hong Kong Electronik Co., Ltd"]] == ["HONG KONG ELECTRONICS"]
+    assert "HONG KONG ELECTRONICS" not in [hit['name'] for hit in index.screen_text(text)]
@@ -1,25 +1,74 @@
 # universal_processor.py
 import os
 import sys
+import time
+import argparse
 import pandas as pd
 from docx import Document as DocxDocument
+import pymupdf
 import pymupdf4llm
-import pytesseract
-from pdf2image import convert_from_path
+import ocr_engine
+import pdf_extraction
+from extraction_cache import file_sha256
+from tabular_store import TabularStore, TABULAR_DB
+import json
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import warnings
-from PIL import Image
+
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 # Отключаем предупреждения
 warnings.filterwarnings("ignore")
-Image.MAX_IMAGE_PIXELS = None
+
+# PDF длиннее этого числа страниц в параллельном режиме делится на части
+PDF_SPLIT_PAGES = int(os.environ.get("PDF_SPLIT_PAGES", "40"))
+# Табличные источники (санкционные списки, таблицы курсов) идут в TabularStore, а не в текст
+TABULAR_EXTENSIONS = ('.xlsx', '.xls')
+# Манифест инкрементальной обработки: источник -> хэш, размер, mtime, выходной файл
+MANIFEST_FILE = "processing_manifest.json"
+
+
+def _init_worker():
+    """Инициализация рабочего процесса обработки"""
+    warnings.filterwarnings("ignore")
+    # Параллельность уже на уровне файлов - OCR внутри процесса без своего пула на все ядра
+    os.environ["OCR_WORKERS"] = "1"
+    # При fork процесс наследует движок родителя (создан при расчете ключа кэша)
+    # с пулом на все ядра - сбрасываем, чтобы движок создался заново с OCR_WORKERS=1
+    ocr_engine._engine = None
+
+
+def _process_file_task(input_dir, output_dir, file, parquet_sidecar, tabular_db):
+    """Обработка одного файла в рабочем процессе"""
+    processor = UniversalDocumentProcessor(input_dir, output_dir, parquet_sidecar, tabular_db)
+    return processor.process_and_save(file)
+
+
+def _pdf_part_task(pdf_path, page_numbers, page_types):
+    """Извлечение части страниц большого PDF в рабочем процессе"""
+    start_time = time.time()
+    page_texts, ocr_results = pdf_extraction.extract_page_range(pdf_path, page_numbers, page_types)
+    return page_texts, ocr_results, time.time() - start_time
+
 
 class UniversalDocumentProcessor:
-    def __init__(self, input_dir="./regulations", output_dir="./processed_regulations"):
+    def __init__(self, input_dir="./regulations", output_dir="./processed_regulations", parquet_sidecar=False,
+                 tabular_db=TABULAR_DB):
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.parquet_sidecar = parquet_sidecar
+        # None - табличные источники выгружаются в текст, как раньше
+        self.tabular_db = tabular_db
+        self._tabular_store = None
         self.processed_files = {}
+        self.workers = 1
+        self.total_seconds = 0.0
         
         # Создаем выходную папку
         os.makedirs(output_dir, exist_ok=True)
@@ -28,41 +77,8 @@ class UniversalDocumentProcessor:
         """Извлечение текста из PDF с OCR поддержкой"""
         print(f"📄 Обработка PDF: {os.path.basename(pdf_path)}")
         
-        try:
-            # Сначала пробуем обычное извлечение
-            text = pymupdf4llm.to_markdown(pdf_path)
-            if len(text.strip()) > 100:
-                print(f"✅ Обычное извлечение: {len(text)} символов")
-                return text
-            else:
-                print("⚠️ Мало текста, используем OCR...")
-        except Exception as e:
-            print(f"⚠️ Ошибка обычного извлечения: {e}")
-            print("🔄 Переходим к OCR...")
-        
-        # OCR обработка
-        try:
-            print("📷 Конвертация в изображения...")
-            images = convert_from_path(pdf_path, dpi=300)
-            
-            all_text = []
-            for i, image in enumerate(images):
-                print(f"🔤 OCR страница {i+1}/{len(images)}...")
-                
-                # Настройки OCR для русского и английского
-                custom_config = r'--oem 3 --psm 6 -l rus+eng'
-                text = pytesseract.image_to_string(image, config=custom_config)
-                
-                if text.strip():
-                    all_text.append(f"=== Страница {i+1} ===\n{text}")
-            
-            combined_text = "\n\n".join(all_text)
-            print(f"✅ OCR завершен: {len(combined_text)} символов")
-            return combined_text
-            
-        except Exception as e:
-            print(f"❌ Ошибка OCR: {e}")
-            return None
+        # Текстовый слой где он есть, OCR только для отсканированных страниц
+        return pdf_extraction.smart_extract_text(pdf_path)
 
     def extract_text_from_docx(self, docx_path):
         """Извлечение текста из DOCX файлов"""
@@ -124,29 +140,28 @@ class UniversalDocumentProcessor:
         print(f"📄 Обработка XLSX: {os.path.basename(xlsx_path)}")
         
         try:
-            # Читаем все листы
-            xlsx_file = pd.ExcelFile(xlsx_path)
+            sheets = self.read_workbook(xlsx_path)
             all_text = []
             
-            for sheet_name in xlsx_file.sheet_names:
-                print(f"  📊 Обработка листа: {sheet_name}")
-                df = pd.read_excel(xlsx_path, sheet_name=sheet_name)
+            for sheet_name, values in sheets.items():
+                print(f"  📊 Обработка листа: {sheet_name} ({len(values)} строк)")
                 
                 # Конвертируем в текст
-                sheet_text = f"=== ЛИСТ: {sheet_name} ===\n"
+                sheet_text = [f"=== ЛИСТ: {sheet_name} ==="]
                 
-                # Добавляем заголовки
-                if not df.empty:
-                    headers = " | ".join([str(col) for col in df.columns])
-                    sheet_text += f"ЗАГОЛОВКИ: {headers}\n\n"
+                if not values.empty:
+                    headers = " | ".join([str(col) for col in values.columns])
+                    sheet_text.append(f"ЗАГОЛОВКИ: {headers}\n")
                     
-                    # Добавляем данные (ограничиваем количество строк)
-                    for idx, row in df.head(1000).iterrows():
-                        row_text = " | ".join([str(val) if pd.notna(val) else "" for val in row])
-                        if row_text.strip():
-                            sheet_text += f"{row_text}\n"
+                    # Все строки, без ограничения: склеиваем колонки векторно
+                    columns = [values[col] for col in values.columns]
+                    rows = columns[0].str.cat(columns[1:], sep=" | ") if len(columns) > 1 else columns[0]
+                    sheet_text.extend(rows[rows.str.strip() != ""])
+                    
+                    if self.parquet_sidecar:
+                        self.write_parquet_sidecar(xlsx_path, sheet_name, values)
                 
-                all_text.append(sheet_text)
+                all_text.append("\n".join(sheet_text) + "\n")
             
             combined_text = "\n\n".join(all_text)
             print(f"✅ XLSX обработан: {len(combined_text)} символов")
@@ -156,6 +171,55 @@ class UniversalDocumentProcessor:
             print(f"❌ Ошибка XLSX: {e}")
             return None
 
+    def read_workbook(self, xlsx_path):
+        """Все листы книги за один разбор, значения - строки ("" вместо пустых)"""
+        sheets = pd.read_excel(xlsx_path, sheet_name=None)
+        return {sheet_name: df.fillna("").astype(str) for sheet_name, df in sheets.items()}
+
+    def get_tabular_store(self):
+        if self._tabular_store is None:
+            self._tabular_store = TabularStore(self.tabular_db)
+        return self._tabular_store
+
+    def save_tabular(self, file):
+        """Табличный источник - в TabularStore: листы как таблицы с индексами по ключевым колонкам"""
+        xlsx_path = os.path.join(self.input_dir, file)
+        print(f"📊 Табличный источник: {file}")
+        sheets = self.read_workbook(xlsx_path)
+        rows = self.get_tabular_store().write_source(file, sheets)
+        if self.parquet_sidecar:
+            for sheet_name, values in sheets.items():
+                self.write_parquet_sidecar(xlsx_path, sheet_name, values)
+        
+        # Прежняя текстовая выгрузка больше не нужна - иначе ее проиндексирует Chroma
+        legacy_output = os.path.join(self.output_dir, f"{file}.txt")
+        if os.path.exists(legacy_output):
+            os.remove(legacy_output)
+        
+        print(f"✅ Сохранено в {self.tabular_db}: {len(sheets)} листов, {rows} строк")
+        return {
+            'status': 'success',
+            'text_length': 0,
+            'rows': rows,
+            'tabular': True,
+            'output_file': self.tabular_db
+        }
+
+    def is_tabular(self, file):
+        return self.tabular_db is not None and os.path.splitext(file)[1].lower() in TABULAR_EXTENSIONS
+
+    def write_parquet_sidecar(self, xlsx_path, sheet_name, df):
+        """Структурированная копия листа рядом с текстовым результатом (Parquet)"""
+        if not PYARROW_AVAILABLE:
+            print("⚠️ pyarrow не установлен, Parquet не сохраняется")
+            return None
+        
+        sidecar = os.path.join(self.output_dir, f"{os.path.basename(xlsx_path)}.{sheet_name}.parquet")
+        # Все колонки строками: в выгрузках смешанные типы в одной колонке
+        df.astype(str).to_parquet(sidecar, index=False)
+        print(f"  💾 Parquet: {sidecar}")
+        return sidecar
+
     def extract_text_from_xml(self, xml_path):
         """Извлечение данных из XML файлов"""
         print(f"📄 Обработка XML: {os.path.basename(xml_path)}")
@@ -238,7 +302,104 @@ class UniversalDocumentProcessor:
             print(f"⚠️ Неподдерживаемый формат: {file_ext}")
             return f"[Файл {os.path.basename(file_path)} - неподдерживаемый формат {file_ext}]"
 
-    def process_all_files(self):
+    def save_result(self, file, text):
+        """Сохраняем извлеченный текст и возвращаем запись для отчета"""
+        if not text:
+            print(f"❌ Не удалось обработать файл")
+            return {
+                'status': 'failed',
+                'error': 'Не удалось извлечь текст'
+            }
+        
+        output_file = os.path.join(self.output_dir, f"{file}.txt")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(f"ИСТОЧНИК: {file}\n")
+            f.write(f"ДАТА ОБРАБОТКИ: {datetime.now().isoformat()}\n")
+            f.write(f"РАЗМЕР ТЕКСТА: {len(text)} символов\n")
+            f.write("=" * 60 + "\n\n")
+            f.write(text)
+        
+        print(f"✅ Сохранено: {output_file}")
+        return {
+            'status': 'success',
+            'text_length': len(text),
+            'output_file': output_file
+        }
+
+    def process_and_save(self, file):
+        """Обработка одного файла с замером времени"""
+        start_time = time.time()
+        try:
+            if self.is_tabular(file):
+                info = self.save_tabular(file)
+            else:
+                text = self.process_file(os.path.join(self.input_dir, file))
+                info = self.save_result(file, text)
+        except Exception as e:
+            info = {
+                'status': 'error',
+                'error': str(e)
+            }
+            print(f"❌ Ошибка: {e}")
+        
+        info['seconds'] = time.time() - start_time
+        return info
+
+    def pdf_page_count(self, file_path):
+        """Число страниц PDF (0 если файл не открывается)"""
+        try:
+            with pymupdf.open(file_path) as doc:
+                return doc.page_count
+        except Exception:
+            return 0
+
+    def load_manifest(self):
+        """Манифест предыдущей обработки ({} если его нет)"""
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': manifest}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def source_fingerprint(self, file, entry=None):
+        """Размер, mtime и хэш источника; хэш пересчитывается только если изменились размер или mtime"""
+        stat = os.stat(os.path.join(self.input_dir, file))
+        fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            fingerprint['sha256'] = entry['sha256']
+        else:
+            fingerprint['sha256'] = file_sha256(os.path.join(self.input_dir, file))
+        return fingerprint
+
+    def is_unchanged(self, file, entry, fingerprint):
+        """Источник не менялся и результат его обработки на месте"""
+        if entry is None or entry.get('sha256') != fingerprint['sha256']:
+            return False
+        # Сменился способ выгрузки (текст <-> таблицы) - обрабатываем заново
+        if bool(entry.get('tabular')) != self.is_tabular(file):
+            return False
+        if entry.get('tabular'):
+            return self.get_tabular_store().has_source(file)
+        return os.path.exists(entry.get('output_file', ''))
+
+    def remove_deleted_outputs(self, files, manifest):
+        """Удаляем результаты обработки источников, которых больше нет"""
+        for file in [f for f in manifest if f not in files]:
+            entry = manifest.pop(file)
+            if entry.get('tabular'):
+                self.get_tabular_store().remove_source(file)
+            elif entry.get('output_file') and os.path.exists(entry['output_file']):
+                os.remove(entry['output_file'])
+            print(f"🗑️ Источник удален, результат удален: {file}")
+
+    def process_all_files(self, parallel=False, workers=None, incremental=True):
         """Обработка всех файлов в папке"""
         if not os.path.exists(self.input_dir):
             print(f"❌ Папка {self.input_dir} не найдена!")
@@ -251,58 +412,154 @@ class UniversalDocumentProcessor:
             print(f"❌ Нет файлов в папке {self.input_dir}")
             return False
         
-        print(f"🚀 Начинаем обработку {len(files)} файлов...")
-        print("=" * 60)
+        start_time = time.time()
+        
+        # Инкрементальный режим: неизмененные файлы не извлекаются заново
+        manifest = self.load_manifest() if incremental else {}
+        if incremental:
+            self.remove_deleted_outputs(files, manifest)
         
+        fingerprints = {}
+        to_process = []
         for file in files:
-            file_path = os.path.join(self.input_dir, file)
-            print(f"\n📁 Файл: {file}")
-            
-            try:
-                # Обрабатываем файл
-                text = self.process_file(file_path)
-                
-                if text:
-                    # Сохраняем результат
-                    output_file = os.path.join(self.output_dir, f"{file}.txt")
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(f"ИСТОЧНИК: {file}\n")
-                        f.write(f"ДАТА ОБРАБОТКИ: {datetime.now().isoformat()}\n")
-                        f.write(f"РАЗМЕР ТЕКСТА: {len(text)} символов\n")
-                        f.write("=" * 60 + "\n\n")
-                        f.write(text)
-                    
-                    self.processed_files[file] = {
-                        'status': 'success',
-                        'text_length': len(text),
-                        'output_file': output_file
-                    }
-                    
-                    print(f"✅ Сохранено: {output_file}")
-                else:
-                    self.processed_files[file] = {
-                        'status': 'failed',
-                        'error': 'Не удалось извлечь текст'
-                    }
-                    print(f"❌ Не удалось обработать файл")
-                    
-            except Exception as e:
+            entry = manifest.get(file)
+            fingerprints[file] = self.source_fingerprint(file, entry)
+            if incremental and self.is_unchanged(file, entry, fingerprints[file]):
+                # Источник мог быть "тронут" без изменений - обновляем mtime в манифесте
+                entry.update(fingerprints[file])
                 self.processed_files[file] = {
-                    'status': 'error',
-                    'error': str(e)
+                    'status': 'success',
+                    'text_length': entry['text_length'],
+                    'output_file': entry['output_file'],
+                    'seconds': 0.0,
+                    'skipped': True
                 }
-                print(f"❌ Ошибка: {e}")
+                if entry.get('tabular'):
+                    self.processed_files[file].update(tabular=True, rows=entry['rows'])
+            else:
+                to_process.append(file)
+        
+        skipped = len(files) - len(to_process)
+        print(f"🚀 Начинаем обработку {len(to_process)} файлов (без изменений: {skipped})...")
+        print("=" * 60)
+        
+        if parallel and to_process:
+            self.process_files_parallel(to_process, workers or os.cpu_count() or 1)
+        else:
+            for file in to_process:
+                print(f"\n📁 Файл: {file}")
+                self.processed_files[file] = self.process_and_save(file)
+        self.total_seconds = time.time() - start_time
+        
+        # Отчет и манифест - в исходном порядке файлов
+        self.processed_files = {file: self.processed_files[file] for file in files}
+        for file in to_process:
+            info = self.processed_files[file]
+            if info['status'] == 'success':
+                manifest[file] = dict(fingerprints[file], output_file=info['output_file'],
+                                      text_length=info['text_length'],
+                                      processed=datetime.now().isoformat())
+                if info.get('tabular'):
+                    manifest[file].update(tabular=True, rows=info['rows'])
+            else:
+                # Неудачная обработка повторится при следующем запуске
+                manifest.pop(file, None)
+        self.save_manifest(manifest)
         
         # Создаем отчет
         self.create_processing_report()
         
         return True
 
+    def process_files_parallel(self, files, workers):
+        """Параллельная обработка: файлы по процессам, большие PDF - частями по страницам"""
+        self.workers = workers
+        print(f"⚡ Параллельный режим: {workers} процессов, PDF от {PDF_SPLIT_PAGES} страниц делятся на части")
+        
+        results = {}
+        parts = {}  # файл -> состояние сборки частей большого PDF
+        futures = {}
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            for file in files:
+                file_path = os.path.join(self.input_dir, file)
+                page_count = 0
+                if os.path.splitext(file)[1].lower() == '.pdf':
+                    page_count = self.pdf_page_count(file_path)
+                
+                page_types = None
+                if page_count > PDF_SPLIT_PAGES:
+                    # Результат частями совпадает с последовательным режимом и берется из того же кэша
+                    cached, key, settings = pdf_extraction.cache_lookup(file_path)
+                    if cached is not None:
+                        results[file] = self.save_result(file, cached['text'])
+                        results[file]['seconds'] = 0.0
+                        continue
+                    page_types = pdf_extraction.split_page_types(file_path)
+                
+                if page_types is not None:
+                    ranges = [list(range(start, min(start + PDF_SPLIT_PAGES, page_count)))
+                              for start in range(0, page_count, PDF_SPLIT_PAGES)]
+                    parts[file] = {'pending': len(ranges), 'pages': {}, 'ocr': {}, 'timings': [],
+                                   'page_types': page_types, 'key': key, 'settings': settings, 'error': None}
+                    print(f"📑 {file}: {page_count} страниц -> {len(ranges)} частей")
+                    for page_numbers in ranges:
+                        futures[executor.submit(_pdf_part_task, file_path, page_numbers, page_types)] = file
+                else:
+                    futures[executor.submit(_process_file_task, self.input_dir, self.output_dir, file,
+                                                   self.parquet_sidecar, self.tabular_db)] = file
+            
+            for future in as_completed(futures):
+                file = futures[future]
+                
+                if file not in parts:
+                    try:
+                        results[file] = future.result()
+                    except Exception as e:
+                        results[file] = {'status': 'error', 'error': str(e), 'seconds': 0.0}
+                    print(f"📁 {file}: {results[file]['status']} ({results[file]['seconds']:.1f} с)")
+                    continue
+                
+                state = parts[file]
+                try:
+                    page_texts, ocr_results, seconds = future.result()
+                    state['pages'].update(page_texts)
+                    state['ocr'].update(ocr_results)
+                    state['timings'].append(seconds)
+                except Exception as e:
+                    state['error'] = str(e)
+                state['pending'] -= 1
+                if state['pending'] == 0:
+                    results[file] = self.save_parts(file, state)
+                    print(f"📁 {file}: {results[file]['status']} ({results[file]['seconds']:.1f} с)")
+        
+        for file in files:
+            self.processed_files[file] = results[file]
+
+    def save_parts(self, file, state):
+        """Склейка частей большого PDF в один результат"""
+        if state['error']:
+            # Целиком - с тем же запасным путем, что и в последовательном режиме
+            print(f"⚠️ Ошибка обработки части {file}: {state['error']}, обрабатываем файл целиком...")
+            return self.process_and_save(file)
+        
+        text, pages = pdf_extraction.merge_page_ranges(state['page_types'], state['pages'], state['ocr'])
+        pdf_extraction.cache_store(os.path.join(self.input_dir, file), state['key'], state['settings'],
+                                   text, pages)
+        info = self.save_result(file, text)
+        
+        # На критическом пути - самая долгая часть, суммарно - процессорное время
+        info['seconds'] = max(state['timings'], default=0.0)
+        info['cpu_seconds'] = sum(state['timings'])
+        info['parts'] = len(state['timings'])
+        return info
+
     def create_processing_report(self):
         """Создаем отчет о обработке"""
         report_file = os.path.join(self.output_dir, "processing_report.txt")
         
         successful = sum(1 for f in self.processed_files.values() if f['status'] == 'success')
+        skipped = sum(1 for f in self.processed_files.values() if f.get('skipped'))
         failed = len(self.processed_files) - successful
         
         with open(report_file, 'w', encoding='utf-8') as f:
@@ -311,16 +568,33 @@ class UniversalDocumentProcessor:
             f.write(f"Дата: {datetime.now().isoformat()}\n")
             f.write(f"Всего файлов: {len(self.processed_files)}\n")
             f.write(f"Успешно обработано: {successful}\n")
-            f.write(f"Ошибки: {failed}\n\n")
+            f.write(f"Без изменений (пропущено): {skipped}\n")
+            f.write(f"Ошибки: {failed}\n")
+            f.write(f"Процессов: {self.workers}\n")
+            f.write(f"Общее время: {self.total_seconds:.1f} с\n\n")
+            
+            # Самые долгие файлы определяют общее время обработки
+            timed = sorted(self.processed_files.items(), key=lambda item: -item[1].get('seconds', 0.0))
+            f.write("САМЫЕ ДОЛГИЕ ФАЙЛЫ:\n")
+            f.write("-" * 40 + "\n")
+            for filename, info in timed[:5]:
+                f.write(f"{info.get('seconds', 0.0):8.1f} с  {filename}\n")
+            f.write("\n")
             
             f.write("ДЕТАЛИ ОБРАБОТКИ:\n")
             f.write("-" * 40 + "\n")
             
             for filename, info in self.processed_files.items():
                 f.write(f"\nФайл: {filename}\n")
-                f.write(f"Статус: {info['status']}\n")
+                f.write(f"Статус: {info['status']}{' (без изменений)' if info.get('skipped') else ''}\n")
+                f.write(f"Время: {info.get('seconds', 0.0):.1f} с\n")
+                if 'parts' in info:
+                    f.write(f"Частей: {info['parts']}, суммарное время частей: {info['cpu_seconds']:.1f} с\n")
                 
-                if info['status'] == 'success':
+                if info['status'] == 'success' and info.get('tabular'):
+                    f.write(f"Строк в таблицах: {info['rows']}\n")
+                    f.write(f"Табличное хранилище: {info['output_file']}\n")
+                elif info['status'] == 'success':
                     f.write(f"Размер текста: {info['text_length']} символов\n")
                     f.write(f"Выходной файл: {info['output_file']}\n")
                 else:
@@ -328,11 +602,22 @@ class UniversalDocumentProcessor:
         
         print(f"\n📊 ИТОГИ ОБРАБОТКИ:")
         print(f"✅ Успешно: {successful}")
+        print(f"⏭️ Без изменений: {skipped}")
         print(f"❌ Ошибки: {failed}")
         print(f"📄 Отчет сохранен: {report_file}")
 
 def main():
-    processor = UniversalDocumentProcessor()
+    parser = argparse.ArgumentParser(description="Обработка регламентов в текст")
+    parser.add_argument("--parallel", action="store_true", help="Параллельная обработка файлов")
+    parser.add_argument("--workers", type=int, default=None, help="Число процессов (по умолчанию - все ядра)")
+    parser.add_argument("--force", action="store_true", help="Обработать заново все файлы, даже неизмененные")
+    parser.add_argument("--parquet", action="store_true", help="Сохранять листы Excel также в Parquet (нужен pyarrow)")
+    parser.add_argument("--tabular-as-text", action="store_true",
+                        help="Выгружать Excel в текст (для эмбеддингов), а не в табличное хранилище")
+    args = parser.parse_args()
+    
+    processor = UniversalDocumentProcessor(parquet_sidecar=args.parquet,
+                                           tabular_db=None if args.tabular_as_text else TABULAR_DB)
     
     print("🚀 Универсальный обработчик документов")
     print("=" * 50)
@@ -353,7 +638,8 @@ def main():
             print(f"  {ext}: {count}")
         
         print("\n🔄 Начинаем обработку...")
-        processor.process_all_files()
+        processor.process_all_files(parallel=args.parallel, workers=args.workers,
+                                    incremental=not args.force)
         
     else:
         print(f"❌ Папка {processor.input_dir} не найдена!")